@@ -0,0 +1,162 @@
+import csv
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import models
+
+from test_02_embedding import get_embeddings
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.chunking import window_spans
+from rag_common.ingest import batched
+from rag_common.quantization import PROFILES, collection_config, memory_estimate, search_params
+from rag_common.vector_store import get_client
+
+# =========================================================
+# 基本設定
+# =========================================================
+REPO = Path(__file__).resolve().parents[2]
+DATA_FILES = (
+    [REPO / "CW/02/text.txt"]
+    + [REPO / f"HW/day5/data_{i:02d}.txt" for i in range(1, 6)]
+    + [REPO / f"HW/day6/CW/04/data_{i:02d}.txt" for i in range(1, 6)]
+)
+QUESTION_PATH = REPO / "HW/day5/questions.csv"
+
+# qdrant：實際建 collection 量 recall / 延遲；simulate：不需要 Qdrant，用 numpy 模擬量化只看 recall
+MODE = sys.argv[1] if len(sys.argv) > 1 else "qdrant"
+QDRANT_URL = "http://localhost:6333"
+TOP_K = 5
+CHUNK_SIZE = 500
+OVERLAP = 50
+UPSERT_BATCH = 256
+TARGET_CHUNKS = 1_000_000      # 記憶體估算用的規模
+
+
+def load_chunks():
+    chunks = []
+    for fp in DATA_FILES:
+        if fp.exists():
+            chunks.extend(window_spans(fp.read_text(encoding="utf-8"), CHUNK_SIZE, OVERLAP, min_len=100))
+    return chunks
+
+
+def load_questions():
+    with open(QUESTION_PATH, encoding="utf-8-sig") as f:
+        return [row["questions"] for row in csv.DictReader(f)]
+
+
+def exact_top_k(Q, X, k=TOP_K):
+    """向量已正規化：cosine = 內積，float32 精確結果當作 recall 的標準答案"""
+    scores = Q @ X.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(found, truth):
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+# =========================================================
+# numpy 模擬量化（與 Qdrant 的做法相同：量化向量粗排 → 原始向量 rescore）
+# =========================================================
+def simulate(profile, Q, X, k=TOP_K):
+    """
+    回傳 (top-k, 實測常駐 bytes)
+
+    真的把向量存成量化格式（int8 → uint8 codes、binary → packbits 每維 1 bit），
+    常駐 bytes = 量化陣列 + 非 on_disk 時的 float32 原始向量（不含 HNSW 連結）
+    """
+    p = PROFILES[profile]
+    quant = p["quantization"]
+    if quant is None:
+        return exact_top_k(Q, X, k), X.nbytes
+
+    if isinstance(quant, models.ScalarQuantization):
+        q = quant.scalar.quantile
+        lo, hi = np.quantile(X, [(1 - q) / 2, (1 + q) / 2])
+        codes = np.clip(np.round((X - lo) / (hi - lo) * 255), 0, 255).astype(np.uint8)
+        approx = Q @ (lo + codes.astype(np.float32) * (hi - lo) / 255).T
+    else:
+        # binary：每一維只留正負號，分數 = 同號維度數
+        codes = np.packbits(X > 0, axis=1)
+        signs = np.unpackbits(codes, axis=1, count=X.shape[1]).astype(np.float32) * 2 - 1
+        approx = np.sign(Q) @ signs.T
+    resident = codes.nbytes + (0 if p["on_disk"] else X.nbytes)
+
+    n_cand = min(len(X), int(k * (p["oversampling"] or 1.0)))
+    cand = np.argpartition(-approx, n_cand - 1, axis=1)[:, :n_cand]
+    exact = np.take_along_axis(Q @ X.T, cand, axis=1)
+    return np.take_along_axis(cand, np.argsort(-exact, axis=1)[:, :k], axis=1), resident
+
+
+# =========================================================
+# Qdrant 實測
+# =========================================================
+def run_qdrant(client, profile, Q, X, k=TOP_K):
+    name = f"bench_quant_{profile}"
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        **collection_config(X.shape[1], models.Distance.COSINE, profile),
+        # 資料量小也建 HNSW / 量化索引，不然全部走未索引的 float32 暴力搜尋
+        optimizers_config=models.OptimizersConfigDiff(indexing_threshold=1)
+    )
+    for batch in batched(list(range(len(X))), UPSERT_BATCH):
+        client.upsert(
+            collection_name=name,
+            points=[models.PointStruct(id=i, vector=X[i].tolist()) for i in batch],
+            wait=True
+        )
+    while client.get_collection(name).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+    params = search_params(profile)
+    found, latency = [], []
+    for q in Q:
+        t0 = time.perf_counter()
+        points = client.query_points(
+            collection_name=name, query=q.tolist(), limit=k,
+            search_params=params, with_payload=False
+        ).points
+        latency.append(time.perf_counter() - t0)
+        found.append([p.id for p in points])
+
+    client.delete_collection(name)
+    return found, np.asarray(latency) * 1000
+
+
+# =========================================================
+# Main
+# =========================================================
+def main():
+    chunks = load_chunks()
+    questions = load_questions()
+    X, dim = get_embeddings(chunks)
+    Q, _ = get_embeddings(questions)
+    print(f"\n{len(chunks)} chunks × {dim} 維，{len(questions)} 個問題，recall@{TOP_K}（對照 float32 精確搜尋）")
+    print(f"估算 = memory_estimate 公式推到 {TARGET_CHUNKS:,} chunks（含 HNSW），不是量測值；"
+          f"simulate 模式另外列出本次資料量化後陣列的實測大小")
+
+    truth = exact_top_k(Q, X)
+    client = get_client(QDRANT_URL) if MODE == "qdrant" else None
+
+    for profile in PROFILES:
+        ram, disk = memory_estimate(TARGET_CHUNKS, dim, profile)
+        line = f"{profile:14s} 估算 RAM {ram / 2**30:6.2f} GB / disk {disk / 2**30:6.2f} GB"
+
+        if client is None:
+            found, resident = simulate(profile, Q, X)
+            recall = recall_at_k(found, truth)
+            print(f"{line}  實測常駐 {resident / 2**20:7.2f} MB  recall={recall:.3f}")
+        else:
+            found, ms = run_qdrant(client, profile, Q, X)
+            recall = recall_at_k(found, truth)
+            print(f"{line}  recall={recall:.3f}  p50={np.percentile(ms, 50):.1f}ms  p95={np.percentile(ms, 95):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
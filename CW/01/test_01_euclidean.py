@@ -1,15 +1,20 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance
+import sys
+from pathlib import Path
 
-client = QdrantClient(url="http://localhost:6333")
+from qdrant_client.models import Distance
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.quantization import PROFILE, collection_config
+from rag_common.vector_store import get_client
+
+client = get_client("http://localhost:6333")
 
 client.create_collection(
     collection_name="CW01_euclidean",
-    vectors_config=VectorParams(
-        size=4096,
-        distance=Distance.EUCLID
-    )
+    # ⭐ 量化 profile（rag_common.quantization.PROFILES，環境變數 RAG_QUANT_PROFILE）
+    **collection_config(4096, Distance.EUCLID, PROFILE)
 )
 
-print("Step 1 EUCLIDEAN collection created")
+print(f"Step 1 EUCLIDEAN collection created（profile：{PROFILE}）")
 
@@ -21,7 +21,7 @@ points = []
 for idx, vector in enumerate(embeddings):
     point = PointStruct(
         id=idx,
-        vector=vector,
+        vector=vector.tolist(),
         payload={
             "text": texts[idx]
         }
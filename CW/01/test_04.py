@@ -1,10 +1,16 @@
-from qdrant_client import QdrantClient
+import sys
+from pathlib import Path
+
 from qdrant_client.models import PointStruct
 
 from test_02_embedding import get_embeddings
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.vector_store import get_client
+
 # Qdrant 連線
-client = QdrantClient(url="http://localhost:6333")
+client = get_client("http://localhost:6333")
 
 # Step 4：原始文字
 texts = [
@@ -26,7 +32,7 @@ for idx, vector in enumerate(embeddings):
     points.append(
         PointStruct(
             id=idx,
-            vector=vector,
+            vector=vector.tolist(),
             payload={"text": texts[idx]}
         )
     )
@@ -1,5 +1,13 @@
-import requests
-from test_02_embedding import get_embeddings
+import sys
+from pathlib import Path
+
+from test_02_embedding import get_query_embedding, query_cache
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.fanout import FanoutSearcher, merge_results
+from rag_common.quantization import search_params
+from rag_common.vector_store import get_client
 
 QDRANT_URL = "http://localhost:6333"
 TOP_K = 3
@@ -7,9 +15,8 @@ TOP_K = 3
 # 查詢文字
 query_text = ["請假需要注意什麼？"]
 
-# 取得 query 向量
-query_embeddings, VECTOR_SIZE = get_embeddings(query_text)
-query_vector = query_embeddings[0]
+# 取得 query 向量（只 embed 一次，三個 collection 共用）
+query_vector = get_query_embedding(query_text[0]).tolist()
 
 print("Query VECTOR_SIZE：", len(query_vector))
 
@@ -19,27 +26,19 @@ collections = [
     "CW01_euclidean"
 ]
 
-for col in collections:
-    print(f"\n=== 搜尋結果：{col} ===")
-
-    response = requests.post(
-        f"{QDRANT_URL}/collections/{col}/points/search",
-        json={
-            "vector": query_vector,
-            "limit": TOP_K,
-            "with_payload": True 
-        }
-    )
-
-    results = response.json()["result"]
+# 三個 collection 同時查詢，共用同一個 client 的連線池
+client = get_client(QDRANT_URL)
+searcher = FanoutSearcher(client, collections, search_params=search_params())
+results = merge_results(searcher.search(query_vector, limit=TOP_K))
 
-    results = response.json().get("result", [])
+for r in results:
+    if r["rank"] == 1:
+        print(f"\n=== 搜尋結果：{r['collection']} ===")
 
-    for r in results:
-        score = r.get("score")
-        payload = r.get("payload")
-        text = payload.get("text") if payload else None
+    payload = r["payload"]
+    text = payload.get("text") if payload else None
 
-        print(f"score={score:.4f} | {text}")
-        
+    print(f"score={r['score']:.4f} | {text}")
 
+searcher.close()
+query_cache.print_stats()
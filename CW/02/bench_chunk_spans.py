@@ -0,0 +1,74 @@
+import sys
+import time
+from pathlib import Path
+
+from langchain_text_splitters import CharacterTextSplitter
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.chunking import splitter_spans, window_spans
+
+# =========================
+# 基本設定
+# =========================
+SIZE_MB = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+
+CHUNK_SIZE = 500
+SLIDING_OVERLAP = 100
+MIN_LEN = 150
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def langchain_chunks(text, overlap):
+    splitter = CharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=overlap,
+        separator="",
+        length_function=len
+    )
+    return splitter.split_text(text)
+
+
+def loop_chunks(text, overlap):
+    step = CHUNK_SIZE - overlap
+    return [
+        text[i:i + CHUNK_SIZE]
+        for i in range(0, len(text), step)
+        if len(text[i:i + CHUNK_SIZE]) > MIN_LEN
+    ]
+
+
+# =========================
+# 1. 把 text.txt 重複到指定大小
+# =========================
+with open("text.txt", "r", encoding="utf-8") as f:
+    base = f.read()
+
+target = int(SIZE_MB * 1024 * 1024)
+text = base * (target // len(base.encode("utf-8")) + 1)
+print(f"測試文字：{len(text):,} 字（約 {SIZE_MB:g} MB）")
+
+# =========================
+# 2. 比較
+# =========================
+for name, overlap in [("固定", 0), ("滑動", SLIDING_OVERLAP)]:
+    print(f"\n=== {name}切塊 overlap={overlap} ===")
+
+    ref, t_ref = timed(lambda: langchain_chunks(text, overlap))
+    chunks, t_new = timed(lambda: splitter_spans(text, CHUNK_SIZE, overlap).tolist())
+    assert chunks == ref
+    print(f"CharacterTextSplitter : {t_ref:8.3f}s  ({len(ref)} chunks)")
+    print(f"splitter_spans        : {t_new:8.3f}s  → {t_ref / t_new:6.1f}x（含產生字串）")
+
+    ref, t_ref = timed(lambda: loop_chunks(text, overlap))
+    spans, t_new = timed(lambda: window_spans(text, CHUNK_SIZE, overlap, MIN_LEN))
+    chunks, t_str = timed(spans.tolist)
+    assert chunks == ref
+    print(f"range 迴圈切片         : {t_ref:8.3f}s  ({len(ref)} chunks)")
+    print(f"window_spans          : {t_new:8.3f}s  → {t_ref / t_new:6.1f}x（只算切點）")
+    print(f"  + 產生字串           : {t_str:8.3f}s")
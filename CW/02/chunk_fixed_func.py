@@ -1,11 +1,11 @@
-from langchain_text_splitters import CharacterTextSplitter
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.chunking import splitter_spans
+
 
 def get_fixed_chunks(text, chunk_size=500, overlap=0):
-    splitter = CharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=overlap,
-        separator="",
-        length_function=len
-    )
-    chunks = splitter.split_text(text)
-    return chunks
+    # 結果與 CharacterTextSplitter(separator="") 相同，但直接以位移計算切點
+    return splitter_spans(text, chunk_size, overlap).tolist()
@@ -1,16 +1,17 @@
-def get_sentence_chunks(text: str):
+def iter_sentence_chunks(lines):
     """
-    表格語意切塊：
-    - 以「一列」為一個 chunk
-    - 移除空行
+    get_sentence_chunks 的串流版本：逐行產生 chunk
     """
-    lines = text.split("\n")
-
-    chunks = []
     for line in lines:
         line = line.strip()
         if line:
-            chunks.append(line)
+            yield line
 
-    return chunks
 
+def get_sentence_chunks(text: str):
+    """
+    表格語意切塊：
+    - 以「一列」為一個 chunk
+    - 移除空行
+    """
+    return list(iter_sentence_chunks(text.split("\n")))
@@ -1,10 +1,11 @@
-from langchain_text_splitters import CharacterTextSplitter
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.chunking import splitter_spans
+
 
 def get_sliding_chunks(text, chunk_size=500, chunk_overlap=100):
-    text_splitter = CharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separator="",
-        length_function=len
-    )
-    return text_splitter.split_text(text)
+    # 結果與 CharacterTextSplitter(separator="") 相同，但直接以位移計算切點
+    return splitter_spans(text, chunk_size, chunk_overlap).tolist()
@@ -1,7 +1,12 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import sys
+from pathlib import Path
+from qdrant_client.models import Distance
 
-from table_semantic_func import get_table_semantic_chunks
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.incremental import index_collection
+from rag_common.vector_store import get_client
+from table_semantic_func import iter_table_semantic_chunks
 from test_02_embedding import get_embeddings
 
 # =========================
@@ -10,57 +15,28 @@ from test_02_embedding import get_embeddings
 QDRANT_URL = "http://localhost:6333"
 COLLECTION_NAME = "CW02_table_semantic"
 DISTANCE = Distance.COSINE
+INCREMENTAL = True    # ⭐ True：只 embed 新增 / 變動的 chunk；False：整個重建
 
 TABLE_FILE = "table/table_txt.md"
 
 # =========================
-#  語意切塊（表格）
-# =========================
-chunks = get_table_semantic_chunks(TABLE_FILE)
-print("表格語意切塊數量：", len(chunks))
-
-# =========================
-#  Embedding
+#  語意切塊（表格，逐行串流）
+#  Embedding（分批）
+#  建立 Qdrant collection（第一批進來時）
+#  Upsert（分批）
 # =========================
-embeddings, VECTOR_SIZE = get_embeddings(chunks)
-print("VECTOR_SIZE =", VECTOR_SIZE)
-
-# =========================
-#  建立 Qdrant collection
-# =========================
-client = QdrantClient(url=QDRANT_URL)
-
-if client.collection_exists(COLLECTION_NAME):
-    client.delete_collection(COLLECTION_NAME)
+client = get_client(QDRANT_URL)
 
-client.create_collection(
-    collection_name=COLLECTION_NAME,
-    vectors_config=VectorParams(
-        size=VECTOR_SIZE,
-        distance=DISTANCE
-    )
-)
-
-# =========================
-#  Upsert
-# =========================
-points = []
-
-for i, vector in enumerate(embeddings):
-    points.append(
-        PointStruct(
-            id=i,
-            vector=vector,
-            payload={
-                "text": chunks[i]
-            }
-        )
-    )
-
-client.upsert(
-    collection_name=COLLECTION_NAME,
-    points=points
+index_collection(
+    client,
+    COLLECTION_NAME,
+    (
+        {"text": c, "source": "table_txt.md"}
+        for c in iter_table_semantic_chunks(TABLE_FILE)
+    ),
+    embed_fn=lambda texts: get_embeddings(texts)[0],
+    distance=DISTANCE,
+    incremental=INCREMENTAL
 )
 
 print("✅ 表格資料已用【語意切塊】嵌入 VDB：", COLLECTION_NAME)
-
@@ -1,9 +1,13 @@
-import requests
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import sys
+from pathlib import Path
+from qdrant_client.models import Distance
 
-from chunk_fixed_func import get_fixed_chunks
-from test_02_embedding import get_embeddings   
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.incremental import index_collection
+from rag_common.ingest import read_blocks, iter_windows
+from rag_common.vector_store import get_client
+from test_02_embedding import get_embeddings
 
 # =========================
 # 基本設定
@@ -11,60 +15,34 @@ from test_02_embedding import get_embeddings
 QDRANT_URL = "http://localhost:6333"
 COLLECTION_NAME = "CW02_fixed"
 DISTANCE = Distance.COSINE
+INCREMENTAL = True    # ⭐ True：只 embed 新增 / 變動的 chunk；False：整個重建
 
-# =========================
-# 1. 讀取文字檔
-# =========================
-with open("text.txt", "r", encoding="utf-8") as f:
-    text = f.read()
-
-# =========================
-# 2. 固定切塊
-# =========================
-chunks = get_fixed_chunks(text)
-
-print("切塊數量：", len(chunks))
+CHUNK_SIZE = 500
+OVERLAP = 0
 
 # =========================
-# 3. Embedding
+# 1. 串流讀取文字檔
+# 2. 固定切塊（與 get_fixed_chunks 切法相同）
 # =========================
-embeddings, VECTOR_SIZE = get_embeddings(chunks)
-
-print("VECTOR_SIZE =", VECTOR_SIZE)
-
-# =========================
-# 4. 建立 Qdrant collection
-# =========================
-client = QdrantClient(url=QDRANT_URL)
-
-client.recreate_collection(
-    collection_name=COLLECTION_NAME,
-    vectors_config=VectorParams(
-        size=VECTOR_SIZE,
-        distance=DISTANCE
-    )
+chunks = (
+    {"text": c, "source": "text.txt"}
+    for c in iter_windows(read_blocks("text.txt"), CHUNK_SIZE, OVERLAP)
 )
 
 # =========================
-# 5. 組成 points 並 upsert
+# 3. Embedding（分批）
+# 4. 建立 Qdrant collection（第一批進來時）
+# 5. 組成 points 並分批 upsert
 # =========================
-points = []
-
-for i, vector in enumerate(embeddings):
-    points.append(
-        PointStruct(
-            id=i,
-            vector=vector,
-            payload={
-                "text": chunks[i]
-            }
-        )
-    )
+client = get_client(QDRANT_URL)
 
-client.upsert(
-    collection_name=COLLECTION_NAME,
-    points=points
+index_collection(
+    client,
+    COLLECTION_NAME,
+    chunks,
+    embed_fn=lambda texts: get_embeddings(texts)[0],
+    distance=DISTANCE,
+    incremental=INCREMENTAL
 )
 
 print("✅ 已完成嵌入到 VDB：", COLLECTION_NAME)
-
@@ -1,7 +1,12 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import sys
+from pathlib import Path
+from qdrant_client.models import Distance
 
-from chunk_sentence_func import get_sentence_chunks
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.incremental import index_collection
+from rag_common.vector_store import get_client
+from chunk_sentence_func import iter_sentence_chunks
 from test_02_embedding import get_embeddings
 
 # =========================
@@ -10,55 +15,25 @@ from test_02_embedding import get_embeddings
 QDRANT_URL = "http://localhost:6333"
 COLLECTION_NAME = "CW02_sentence"
 DISTANCE = Distance.COSINE
+INCREMENTAL = True    # ⭐ True：只 embed 新增 / 變動的 chunk；False：整個重建
 
 # =========================
-# 1. 讀取文字檔
-# =========================
-with open("text.txt", "r", encoding="utf-8") as f:
-    text = f.read()
-
-# =========================
+# 1. 逐行讀取文字檔
 # 2. 語句切塊
+# 3. Embedding（分批）
+# 4. 建立 Qdrant collection（第一批進來時）
+# 5. 分批 Upsert
 # =========================
-chunks = get_sentence_chunks(text)
-print("切塊數量：", len(chunks))
-
-# =========================
-# 3. Embedding
-# =========================
-embeddings, VECTOR_SIZE = get_embeddings(chunks)
-print("VECTOR_SIZE =", VECTOR_SIZE)
-
-# =========================
-# 4. 建立 Qdrant collection
-# =========================
-client = QdrantClient(url=QDRANT_URL)
+client = get_client(QDRANT_URL)
 
-client.recreate_collection(
-    collection_name=COLLECTION_NAME,
-    vectors_config=VectorParams(
-        size=VECTOR_SIZE,
-        distance=DISTANCE
-    )
-)
-
-# =========================
-# 5. Upsert
-# =========================
-points = []
-
-for i, vector in enumerate(embeddings):
-    points.append(
-        PointStruct(
-            id=i,
-            vector=vector,
-            payload={"text": chunks[i]}
-        )
+with open("text.txt", "r", encoding="utf-8") as f:
+    index_collection(
+        client,
+        COLLECTION_NAME,
+        ({"text": c, "source": "text.txt"} for c in iter_sentence_chunks(f)),
+        embed_fn=lambda texts: get_embeddings(texts)[0],
+        distance=DISTANCE,
+        incremental=INCREMENTAL
     )
 
-client.upsert(
-    collection_name=COLLECTION_NAME,
-    points=points
-)
-
 print("✅ 已完成嵌入到 VDB：", COLLECTION_NAME)
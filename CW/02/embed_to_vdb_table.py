@@ -1,8 +1,12 @@
-import os
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import sys
+from pathlib import Path
+from qdrant_client.models import Distance
 
-from chunk_sentence_func import get_sentence_chunks
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.incremental import index_collection
+from rag_common.vector_store import get_client
+from chunk_sentence_func import iter_sentence_chunks
 from test_02_embedding import get_embeddings
 
 # =========================
@@ -11,63 +15,30 @@ from test_02_embedding import get_embeddings
 QDRANT_URL = "http://localhost:6333"
 COLLECTION_NAME = "CW02_table_sentence"
 DISTANCE = Distance.COSINE
+INCREMENTAL = True    # ⭐ True：只 embed 新增 / 變動的 chunk；False：整個重建
 
 TABLE_FILE = "table/table_txt.md"
 
 # =========================
-# 1. 讀取表格文字
-# =========================
-with open(TABLE_FILE, "r", encoding="utf-8") as f:
-    text = f.read()
-
-# =========================
+# 1. 逐行讀取表格文字
 # 2. 語意切塊（以列為單位）
+# 3. Embedding（分批）
+# 4. 建立 Qdrant collection（第一批進來時）
+# 5. 分批 Upsert 到 VDB
 # =========================
-chunks = get_sentence_chunks(text)
-print("表格切塊數量：", len(chunks))
+client = get_client(QDRANT_URL)
 
-# =========================
-# 3. Embedding
-# =========================
-embeddings, VECTOR_SIZE = get_embeddings(chunks)
-print("VECTOR_SIZE =", VECTOR_SIZE)
-
-# =========================
-# 4. 建立 Qdrant collection
-# =========================
-client = QdrantClient(url=QDRANT_URL)
-
-if client.collection_exists(COLLECTION_NAME):
-    client.delete_collection(COLLECTION_NAME)
-
-client.create_collection(
-    collection_name=COLLECTION_NAME,
-    vectors_config=VectorParams(
-        size=VECTOR_SIZE,
-        distance=DISTANCE
-    )
-)
-
-# =========================
-# 5. Upsert 到 VDB
-# =========================
-points = []
-
-for i, vector in enumerate(embeddings):
-    points.append(
-        PointStruct(
-            id=i,
-            vector=vector,
-            payload={
-                "text": chunks[i],
-                "source": "table_txt.md"
-            }
-        )
+with open(TABLE_FILE, "r", encoding="utf-8") as f:
+    index_collection(
+        client,
+        COLLECTION_NAME,
+        (
+            {"text": c, "source": "table_txt.md"}
+            for c in iter_sentence_chunks(f)
+        ),
+        embed_fn=lambda texts: get_embeddings(texts)[0],
+        distance=DISTANCE,
+        incremental=INCREMENTAL
     )
 
-client.upsert(
-    collection_name=COLLECTION_NAME,
-    points=points
-)
-
 print("✅ 表格資料已使用【語意切塊】嵌入到 VDB")
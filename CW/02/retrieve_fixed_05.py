@@ -1,5 +1,11 @@
-import requests
-from test_02_embedding import get_embeddings
+import sys
+from pathlib import Path
+
+from test_02_embedding import get_query_embedding, query_cache
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.vector_store import get_client
 
 # =========================
 # 基本設定
@@ -16,24 +22,21 @@ query_text = ["請問這份文件在說什麼？"]
 # =========================
 # 2. 轉成向量
 # =========================
-query_embeddings, VECTOR_SIZE = get_embeddings(query_text)
-query_vector = query_embeddings[0]
+query_vector = get_query_embedding(query_text[0]).tolist()
 
 print("Query VECTOR_SIZE =", len(query_vector))
 
 # =========================
-# 3. 呼叫 Qdrant Search API
+# 3. 呼叫 Qdrant 搜尋（RAG_VECTOR_BACKEND=numpy 時不需要 server）
 # =========================
-response = requests.post(
-    f"{QDRANT_URL}/collections/{COLLECTION_NAME}/points/search",
-    json={
-        "vector": query_vector,
-        "limit": TOP_K,
-        "with_payload": True
-    }
-)
+client = get_client(QDRANT_URL)
 
-results = response.json()["result"]
+results = client.query_points(
+    collection_name=COLLECTION_NAME,
+    query=query_vector,
+    limit=TOP_K,
+    with_payload=True
+).points
 
 # =========================
 # 4. 印出召回結果
@@ -42,7 +45,8 @@ print("\n🔍 查詢問題：", query_text[0])
 print("=" * 50)
 
 for i, r in enumerate(results, 1):
-    print(f"[結果 {i}] score = {r['score']}")
-    print(r["payload"]["text"])
+    print(f"[結果 {i}] score = {r.score}")
+    print(r.payload["text"])
     print("-" * 50)
 
+query_cache.print_stats()
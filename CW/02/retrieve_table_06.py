@@ -1,5 +1,11 @@
-from qdrant_client import QdrantClient
-from test_02_embedding import get_embeddings
+import sys
+from pathlib import Path
+
+from test_02_embedding import get_query_embedding, query_cache
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.vector_store import get_client
 
 # =========================
 # 基本設定
@@ -12,14 +18,13 @@ QUERY = "AI 邊緣運算的技術發展趨勢是什麼？"
 # =========================
 #  Query embedding
 # =========================
-query_vector, VECTOR_SIZE = get_embeddings([QUERY])
-query_vector = query_vector[0]
+query_vector = get_query_embedding(QUERY).tolist()
 
 
 # =========================
 #  建立 Qdrant client
 # =========================
-client = QdrantClient(url=QDRANT_URL)
+client = get_client(QDRANT_URL)
 
 # =========================
 #  搜尋
@@ -42,3 +47,5 @@ for i, r in enumerate(results, 1):
     print("Score:", r.score)
     print("Text:", r.payload["text"])
     print()
+
+query_cache.print_stats()
@@ -1,20 +1,21 @@
-def get_table_semantic_chunks(file_path: str):
+def iter_table_semantic_chunks(file_path: str):
     """
-    一行表格 = 一個語意 chunk
+    get_table_semantic_chunks 的串流版本：逐行讀檔、逐行產生 chunk
     """
-    chunks = []
-
     with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+        for line in f:
+            line = line.strip()
 
-    for line in lines:
-        line = line.strip()
+            if not line:
+                continue
+            if set(line) <= {"|", "-", " "}:
+                continue
 
-        if not line:
-            continue
-        if set(line) <= {"|", "-", " "}:
-            continue
+            yield line
 
-        chunks.append(line)
 
-    return chunks
+def get_table_semantic_chunks(file_path: str):
+    """
+    一行表格 = 一個語意 chunk
+    """
+    return list(iter_table_semantic_chunks(file_path))
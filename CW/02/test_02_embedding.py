@@ -1,38 +1,42 @@
-import requests
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.embed_cache import EmbeddingCache
+from rag_common.embedding import EmbeddingClient, EMBED_API_URL
+from rag_common.query_cache import query_cache_for
 
 # Embedding API
-API_URL = "https://ws-04.wade0426.me/embed"
+API_URL = EMBED_API_URL
+
+# 共用 client：切 batch、連線池、多個 batch 同時送出
+# 已算過的文字直接從本機快取讀取，不再呼叫 API
+_client = EmbeddingClient(url=API_URL, cache=EmbeddingCache(API_URL))
+
+# 查詢向量快取：同一個問題查多個 collection 只 embed 一次（記憶體 LRU + 上面的磁碟快取）
+query_cache = query_cache_for(_client)
 
 #把embedding變成funtion能重複使用
 
 def get_embeddings(texts, normalize=True):
     """
-    呼叫 embedding API
+    呼叫 embedding API（分 batch、共用連線）
     回傳：
-        embeddings: List[List[float]]
+        embeddings: np.ndarray，shape = (len(texts), vector_size)，float32
         vector_size: int
     """
-    response = requests.post(
-        API_URL,
-        json={
-            "texts": texts,
-            "normalize": normalize
-        }
-    )
-    
-    
-    print("狀態碼：", response.status_code)
-
-    if response.status_code != 200:
-        raise Exception("Embedding API 呼叫失敗")
+    embeddings = _client.embed(texts, normalize=normalize)
 
-    data = response.json()
-    embeddings = data["embeddings"]
-    
     # ⭐ 不寫死，動態取得維度
-    vector_size = len(embeddings[0])
+    vector_size = embeddings.shape[1]
 
     return embeddings, vector_size
+
+
+def get_query_embedding(text):
+    """單一查詢的向量（1-D），重複的問題直接從快取拿"""
+    return query_cache.embed_one(text)
     
     
     
@@ -1,10 +1,23 @@
 import os
 import re
 import csv
+import sys
 import time
 import requests
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from pathlib import Path
+from qdrant_client.models import Distance
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.chunk_store import ChunkStore, without_text
+from rag_common.chunking import sentence_chunks, window_spans
+from rag_common.embed_cache import EmbeddingCache
+from rag_common.embedding import EmbeddingClient
+from rag_common.fanout import FanoutSearcher
+from rag_common.incremental import index_collection
+from rag_common.query_cache import query_cache_for
+from rag_common.rate_limit import RETRY_STATUS, get_limiter, print_stats
+from rag_common.vector_store import get_client
 
 # =========================================================
 # 基本設定
@@ -24,6 +37,9 @@ SLIDING_OVERLAP = 50
 SEMANTIC_CHUNK_SIZE = 500
 SEMANTIC_OVERLAP = 50
 
+INCREMENTAL = True    # ⭐ True：只 embed 新增 / 變動的 chunk；False：整個重建
+BATCH_RETRIEVE = True # ⭐ True：所有問題一次 embed + query_batch_points；False：逐題查詢
+
 
 # =========================================================
 # 工具函式
@@ -38,12 +54,29 @@ def load_questions():
         return list(csv.DictReader(f))
 
 
+embed_client = EmbeddingClient(
+    url=EMBED_API_URL,
+    batch_size=32,
+    timeout=60,
+    cache=EmbeddingCache(EMBED_API_URL)
+)
+
+
+# chunk 原文：固定 / 滑動切塊的 point 只帶 (doc_id, start, end)，三個 collection 共用同一份原文
+store = ChunkStore("day5")
+
+
+# 查詢向量：同一題查三個 collection 只 embed 一次
+query_cache = query_cache_for(embed_client)
+
+
 def get_embedding(texts):
-    payload = {"texts": texts, "normalize": True, "batch_size": 32}
-    r = requests.post(EMBED_API_URL, json=payload, timeout=60)
-    r.raise_for_status()
-    data = r.json()
-    return data["embeddings"], data["dimension"]
+    embs = embed_client.embed(texts, normalize=True)
+    return embs, embs.shape[1]
+
+
+# 評分 API 的速率由 limiter 自動調整（取代每題固定 sleep），429 / 5xx / 逾時退避重試
+score_limiter = get_limiter(SCORE_API_URL)
 
 
 def submit_answer(q_id, answer):
@@ -51,7 +84,18 @@ def submit_answer(q_id, answer):
         "q_id": int(q_id),
         "student_answer": answer.strip()[:2000]
     }
-    r = requests.post(SCORE_API_URL, json=payload, timeout=60)
+
+    def post():
+        r = requests.post(SCORE_API_URL, json=payload, timeout=60)
+        if r.status_code in RETRY_STATUS:
+            r.raise_for_status()
+        return r
+
+    try:
+        r = score_limiter.call(post)
+    except requests.RequestException as e:
+        print(f"  ⚠️ 評分失敗（q_id={q_id}）：{e}")
+        return 0.0
     if r.status_code == 200:
         return float(r.json().get("score", 0.0))
     return 0.0
@@ -60,90 +104,74 @@ def submit_answer(q_id, answer):
 # =========================================================
 # Chunking 方法
 # =========================================================
+# 三種切塊皆為 generator，一次只處理一個檔案，交給 pipeline 分批 embed / upsert
 def fixed_chunking():
-    chunks = []
     for fn in DATA_FILES:
-        text = load_text(fn)
-        for i in range(0, len(text), FIXED_CHUNK_SIZE):
-            c = text[i:i + FIXED_CHUNK_SIZE]
-            if len(c) > 150:
-                chunks.append({"text": c, "source": fn})
-    return chunks
+        spans = window_spans(load_text(fn), FIXED_CHUNK_SIZE, 0, min_len=150)
+        for ref, c in zip(store.add_spans(spans), spans):
+            yield {"text": c, "source": fn, **ref}
 
 
 def sliding_chunking():
-    chunks = []
-    step = SLIDING_CHUNK_SIZE - SLIDING_OVERLAP
     for fn in DATA_FILES:
-        text = load_text(fn)
-        for i in range(0, len(text), step):
-            c = text[i:i + SLIDING_CHUNK_SIZE]
-            if len(c) > 150:
-                chunks.append({"text": c, "source": fn})
-    return chunks
+        spans = window_spans(load_text(fn), SLIDING_CHUNK_SIZE, SLIDING_OVERLAP, min_len=150)
+        for ref, c in zip(store.add_spans(spans), spans):
+            yield {"text": c, "source": fn, **ref}
 
 
 def semantic_chunking():
-    chunks = []
-    seps = ["。", "！", "？", "；"]
+    # 單次掃描句子邊界，結果與逐一分隔符號 split + buf 累加的寫法相同
+    # 句尾會補上分隔符號，不是原文的連續片段，payload 仍直接存 "text"
     for fn in DATA_FILES:
         text = load_text(fn)
-        sents = [text]
-        for sep in seps:
-            tmp = []
-            for s in sents:
-                tmp.extend([p + sep for p in s.split(sep) if p.strip()])
-            sents = tmp
-
-        buf = ""
-        for s in sents:
-            if len(buf) + len(s) <= SEMANTIC_CHUNK_SIZE:
-                buf += s
-            else:
-                if len(buf) > 150:
-                    chunks.append({"text": buf, "source": fn})
-                buf = buf[-SEMANTIC_OVERLAP:] + s
-
-        if len(buf) > 150:
-            chunks.append({"text": buf, "source": fn})
-
-    return chunks
+        for _, _, c in sentence_chunks(
+            text, SEMANTIC_CHUNK_SIZE, SEMANTIC_OVERLAP, min_len=150
+        ):
+            yield {"text": c, "source": fn}
 
 
 # =========================================================
 # Qdrant 操作
 # =========================================================
-def build_collection(client, name, chunks, dim):
-    client.recreate_collection(
-        collection_name=name,
-        vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+def build_collection(client, name, chunks):
+    # 切塊 → embed → upsert 串流進行；增量模式下只處理有變動的 chunk
+    index_collection(
+        client,
+        name,
+        chunks,
+        embed_fn=lambda texts: get_embedding(texts)[0],
+        distance=Distance.COSINE,
+        incremental=INCREMENTAL,
+        payload_fn=without_text
     )
 
-    texts = [c["text"] for c in chunks]
-    embs, _ = get_embedding(texts)
 
-    points = []
-    for i, (c, v) in enumerate(zip(chunks, embs)):
-        points.append(PointStruct(
-            id=i,
-            vector=v,
-            payload={"text": c["text"], "source": c["source"]}
-        ))
+def _top1(points):
+    if points:
+        p = points[0]
+        return store.text(p.payload), p.payload["source"]
+    return "", ""
+
 
-    client.upsert(collection_name=name, points=points)
+def retrieve_top1(searcher, question):
+    """同一題同時查所有 collection，回傳 {collection: (text, source)}"""
+    q_vec = query_cache.embed_one(question)
+    hits = searcher.search(q_vec, limit=1)
+    return {col: _top1(points) for col, points in hits.items()}
 
 
-def retrieve_top1(client, collection, question):
-    q_emb, _ = get_embedding([question])
-    res = client.query_points(
-        collection_name=collection,
-        query=q_emb[0],
-        limit=1
-    )
-    if res.points:
-        p = res.points[0]
-        return p.payload["text"], p.payload["source"]
-    return "", ""
+def retrieve_top1_batch(searcher, questions):
+    """
+    所有問題一次 embed，每個 collection 以 query_batch_points 分批查詢
+
+    回傳：依 questions 順序的 [{collection: (text, source)}]
+    """
+    q_vecs = query_cache.embed(questions)
+    hits = searcher.search_batch(q_vecs, limit=1)
+    return [
+        {col: _top1(hits[col][i]) for col in hits}
+        for i in range(len(questions))
+    ]
 
 
 # =========================================================
@@ -153,13 +181,12 @@ def main():
     questions = load_questions()
 
     methods = {
-        "固定大小": fixed_chunking(),
-        "滑動視窗": sliding_chunking(),
-        "語意切塊": semantic_chunking()
+        "固定大小": fixed_chunking,
+        "滑動視窗": sliding_chunking,
+        "語意切塊": semantic_chunking
     }
 
-    client = QdrantClient(url=QDRANT_URL)
-    _, dim = get_embedding(["test"])
+    client = get_client(QDRANT_URL)
 
     collections = {
         "固定大小": "fixed_chunks",
@@ -168,16 +195,26 @@ def main():
     }
 
     for m in methods:
-        build_collection(client, collections[m], methods[m], dim)
+        build_collection(client, collections[m], methods[m]())
         print(f"  建立 collection：{m}")
 
+    # 三個 collection 的搜尋同時送出，共用 client 的連線池
+    searcher = FanoutSearcher(client, collections.values())
+
+    if BATCH_RETRIEVE:
+        t0 = time.perf_counter()
+        top1_all = retrieve_top1_batch(searcher, [q["questions"] for q in questions])
+        print(f"\n批次檢索 {len(questions)} 題：{time.perf_counter() - t0:.2f}s")
+    else:
+        top1_all = (retrieve_top1(searcher, q["questions"]) for q in questions)
+
     rows = []
     uid = 1
 
-    for q in questions:
+    for q, top1 in zip(questions, top1_all):
         print(f"\nQ{q['q_id']}：{q['questions'][:40]}...")
         for m in methods:
-            text, src = retrieve_top1(client, collections[m], q["questions"])
+            text, src = top1[collections[m]]
             score = submit_answer(q["q_id"], text)
 
             rows.append({
@@ -191,7 +228,6 @@ def main():
 
             print(f"  {m} | score={score:.4f} | {src}")
             uid += 1
-            time.sleep(0.3)
 
     with open(OUTPUT_CSV, "w", encoding="utf-8-sig", newline="") as f:
         writer = csv.DictWriter(
@@ -201,7 +237,10 @@ def main():
         writer.writeheader()
         writer.writerows(rows)
 
+    searcher.close()
     print(f"\n完成！CSV 輸出：{OUTPUT_CSV}")
+    query_cache.print_stats()
+    print_stats()
     
         # =====================================================
     # 平均分數統計
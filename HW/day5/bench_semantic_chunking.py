@@ -0,0 +1,78 @@
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.chunking import sentence_chunks
+
+# =========================================================
+# 基本設定
+# =========================================================
+DATA_FILES = [f"data_{i:02d}.txt" for i in range(1, 6)]
+SCALE = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+CHUNK_SIZE = 500
+OVERLAP = 50
+MIN_LEN = 150
+
+
+def load_text(fp):
+    with open(fp, encoding="utf-8") as f:
+        return re.sub(r"\s+", " ", f.read()).strip()
+
+
+def old_semantic_chunks(text):
+    """原本 semantic_chunking 的寫法（單一檔案）"""
+    chunks = []
+    seps = ["。", "！", "？", "；"]
+    sents = [text]
+    for sep in seps:
+        tmp = []
+        for s in sents:
+            tmp.extend([p + sep for p in s.split(sep) if p.strip()])
+        sents = tmp
+
+    buf = ""
+    for s in sents:
+        if len(buf) + len(s) <= CHUNK_SIZE:
+            buf += s
+        else:
+            if len(buf) > MIN_LEN:
+                chunks.append(buf)
+            buf = buf[-OVERLAP:] + s
+
+    if len(buf) > MIN_LEN:
+        chunks.append(buf)
+    return chunks
+
+
+def new_semantic_chunks(text):
+    return [c for _, _, c in sentence_chunks(text, CHUNK_SIZE, OVERLAP, MIN_LEN)]
+
+
+# =========================================================
+# Main
+# =========================================================
+def main():
+    corpus = " ".join(load_text(fn) for fn in DATA_FILES)
+    text = " ".join([corpus] * SCALE)
+    print(f"測試文字：data_01~05 × {SCALE} = {len(text):,} 字")
+
+    t0 = time.perf_counter()
+    ref = old_semantic_chunks(text)
+    t_old = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    got = new_semantic_chunks(text)
+    t_new = time.perf_counter() - t0
+
+    assert got == ref, "輸出與舊寫法不一致"
+
+    print(f"舊寫法（逐符號 split）：{t_old:8.3f}s  ({len(ref)} chunks)")
+    print(f"sentence_chunks       ：{t_new:8.3f}s  → {t_old / t_new:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
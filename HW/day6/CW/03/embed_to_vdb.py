@@ -1,55 +1,53 @@
 import os
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
+import sys
+from pathlib import Path
+from qdrant_client.models import Distance
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.chunk_store import ChunkStore, without_text
+from rag_common.chunking import window_spans
+from rag_common.embed_cache import EmbeddingCache, cached_encode
+from rag_common.incremental import index_collection
+from rag_common.vector_store import get_client
+
 DATA_DIR = "."
 COLLECTION = "cw03_docs"
+INCREMENTAL = True    # ⭐ True：只 embed 新增 / 變動的 chunk；False：整個重建
 
 CHUNK_SIZE = 500
 OVERLAP = 50
 
 model = SentenceTransformer("all-MiniLM-L6-v2")
-client = QdrantClient(url="http://localhost:6333")
+embed_cache = EmbeddingCache("all-MiniLM-L6-v2")
+client = get_client("http://localhost:6333")
+store = ChunkStore(COLLECTION)   # chunk 原文放這裡，point payload 只帶位移
 
 
 def sliding_chunk(text):
-    step = CHUNK_SIZE - OVERLAP
-    return [
-        text[i:i + CHUNK_SIZE]
-        for i in range(0, len(text), step)
-        if len(text[i:i + CHUNK_SIZE]) > 100
-    ]
+    return window_spans(text, CHUNK_SIZE, OVERLAP, min_len=100)
 
 
-def main():
-    docs = []
-
-    for fn in os.listdir(DATA_DIR):
+def iter_docs():
+    for fn in sorted(os.listdir(DATA_DIR)):
         if fn.startswith("data_") and fn.endswith(".txt"):
             with open(fn, encoding="utf-8") as f:
-                for chunk in sliding_chunk(f.read()):
-                    docs.append({"text": chunk, "source": fn})
+                spans = sliding_chunk(f.read())
+                for ref, chunk in zip(store.add_spans(spans), spans):
+                    yield {"text": chunk, "source": fn, **ref}
 
-    embeddings = model.encode([d["text"] for d in docs]).tolist()
 
-    if client.collection_exists(COLLECTION):
-        client.delete_collection(COLLECTION)
-
-    client.create_collection(
-        collection_name=COLLECTION,
-        vectors_config=VectorParams(
-            size=len(embeddings[0]),
-            distance=Distance.COSINE
-        )
+def main():
+    index_collection(
+        client,
+        COLLECTION,
+        iter_docs(),
+        embed_fn=lambda texts: cached_encode(model, texts, embed_cache),
+        distance=Distance.COSINE,
+        incremental=INCREMENTAL,
+        payload_fn=without_text
     )
-
-    points = [
-        PointStruct(id=i, vector=embeddings[i], payload=docs[i])
-        for i in range(len(docs))
-    ]
-
-    client.upsert(collection_name=COLLECTION, points=points)
     print("✅ Sliding Window chunks 已嵌入 Qdrant")
 
 
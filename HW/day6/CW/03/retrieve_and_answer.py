@@ -1,19 +1,33 @@
+import sys
+from pathlib import Path
+
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
-from qdrant_client import QdrantClient
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.batch_query import batch_query, dense_requests
+from rag_common.chunk_store import ChunkStore
+from rag_common.rate_limit import get_limiter
+from rag_common.vector_store import get_client
+
+LLM_BASE_URL = "https://ws-02.wade0426.me/v1"
+
 llm = ChatOpenAI(
-    base_url="https://ws-02.wade0426.me/v1",
+    base_url=LLM_BASE_URL,
     api_key="",
     model="google/gemma-3-27b-it",
-    temperature=0
+    temperature=0,
+    max_retries=0
 )
+llm_limiter = get_limiter(LLM_BASE_URL)   # 限速 + 429 / 5xx / 逾時退避重試
 
-client = QdrantClient(url="http://localhost:6333")
+client = get_client("http://localhost:6333")
 embedder = SentenceTransformer("all-MiniLM-L6-v2")
 
 COLLECTION = "cw03_docs"
+store = ChunkStore(COLLECTION)   # 依 payload 的 (doc_id, start, end) 取回原文
 
 
 def retrieve(query, top_k=5):
@@ -27,7 +41,19 @@ def retrieve(query, top_k=5):
     if not res.points:
         return []
 
-    return [p.payload["text"] for p in res.points]
+    # 重疊 / 相鄰的 chunk 合併成一段，prompt 不重複送出重疊的文字
+    return store.contexts(res.points)
+
+
+def retrieve_batch(queries, top_k=5):
+    """
+    批次版 retrieve：所有查詢一次 encode，再用 query_batch_points 分批查詢
+
+    依 queries 順序逐題 yield 文字 list
+    """
+    vecs = embedder.encode(list(queries))
+    for points in batch_query(client, COLLECTION, dense_requests(vecs, top_k)):
+        yield store.contexts(points)
 
 
 def answer(question, contexts):
@@ -40,6 +66,6 @@ def answer(question, contexts):
 問題：
 {question}
 """
-    resp = llm.invoke([HumanMessage(content=prompt)])
+    resp = llm_limiter.call(llm.invoke, [HumanMessage(content=prompt)])
     return resp.content.strip()
 
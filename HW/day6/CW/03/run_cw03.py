@@ -1,31 +1,52 @@
 import csv
+import sys
+from pathlib import Path
+
 from query_rewrite import rewrite_query
-from retrieve_and_answer import retrieve, answer
+from retrieve_and_answer import retrieve, retrieve_batch, answer
+
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.async_batch import Stage, run_stages
+from rag_common.rate_limit import print_stats
 
 QUESTIONS_CSV = "questions.csv"
+BATCH_RETRIEVE = True   # ⭐ True：同時在等檢索的查詢一次 embed + query_batch_points；False：逐題查詢
+LIMITS = {"llm": 8, "local": 1}   # ⭐ 每個後端同時進行的呼叫數
 
 
 def main():
     with open(QUESTIONS_CSV, encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
+        questions = [{"question": r["題目"]} for r in csv.DictReader(f)]
 
-        for i, r in enumerate(reader, start=1):
-            question = r["題目"]   
+    if BATCH_RETRIEVE:
+        retrieve_stage = Stage(
+            "contexts",
+            batch_fn=lambda cs: list(retrieve_batch([c["rewrite"] for c in cs])),
+            backend="local"
+        )
+    else:
+        retrieve_stage = Stage("contexts", lambda c: retrieve(c["rewrite"]), backend="local")
 
-            print(f"\nQ{i}: {question}")
+    # 改寫 → 檢索 → 回答 流水線，不同題目同時進行；結果依題目順序回傳
+    print("✏️ 改寫、檢索、回答中...")
+    results = run_stages(questions, [
+        Stage("rewrite", lambda c: rewrite_query(c["question"]), backend="llm"),
+        retrieve_stage,
+        Stage("answer", lambda c: answer(c["question"], c["contexts"]), backend="llm"),
+    ], LIMITS)
 
-            rq = rewrite_query(question)
-            print(f" Rewrite: {rq}")
+    for i, r in enumerate(results, start=1):
+        print(f"\nQ{i}: {r['question']}")
+        print(f" Rewrite: {r['rewrite']}")
+        print(f" Retrieved {len(r['contexts'])} passages（重疊 chunk 已合併）")
 
-            contexts = retrieve(rq)
-            print(f" Retrieved {len(contexts)} chunks")
+        print("💡 Answer:")
+        print(r["answer"])
 
-            final_answer = answer(question, contexts)
-
-            print("💡 Answer:")
-            print(final_answer)
+    print()
+    print_stats()
 
 
 if __name__ == "__main__":
     main()
-
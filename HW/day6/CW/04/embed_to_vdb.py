@@ -1,26 +1,34 @@
 import os
+import sys
+from pathlib import Path
 from qdrant_client import QdrantClient, models
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.chunk_store import ChunkStore, without_text
+from rag_common.chunking import window_spans
+from rag_common.embed_cache import EmbeddingCache, cached_encode
+from rag_common.sparse import SparseBM25Encoder, sparse_vector_params
+
 DATA_DIR = "."
 COLLECTION = "cw04_hybrid_docs"
 
 CHUNK_SIZE = 500
 OVERLAP = 50
+BATCH_SIZE = 256      # ⭐ 每批同時算 dense + sparse 並 upsert
 
 QDRANT_URL = "http://localhost:6333"
 
 embedder = SentenceTransformer("all-MiniLM-L6-v2")
+embed_cache = EmbeddingCache("all-MiniLM-L6-v2")
+sparse_encoder = SparseBM25Encoder()
 client = QdrantClient(url=QDRANT_URL)
+store = ChunkStore(COLLECTION)   # chunk 原文放這裡，point payload 只帶位移
 
 
 def sliding_chunk(text):
-    step = CHUNK_SIZE - OVERLAP
-    return [
-        text[i:i + CHUNK_SIZE]
-        for i in range(0, len(text), step)
-        if len(text[i:i + CHUNK_SIZE]) > 100
-    ]
+    return window_spans(text, CHUNK_SIZE, OVERLAP, min_len=100)
 
 
 def main():
@@ -29,48 +37,51 @@ def main():
     for fn in os.listdir(DATA_DIR):
         if fn.startswith("data_") and fn.endswith(".txt"):
             with open(fn, encoding="utf-8") as f:
-                for chunk in sliding_chunk(f.read()):
+                spans = sliding_chunk(f.read())
+                for ref, chunk in zip(store.add_spans(spans), spans):
                     docs.append({
                         "text": chunk,
-                        "source": fn
+                        "source": fn,
+                        **ref
                     })
 
     print(f"Total chunks: {len(docs)}")
 
-    embeddings = embedder.encode([d["text"] for d in docs]).tolist()
-    dim = len(embeddings[0])
+    texts = [d["text"] for d in docs]
+    sparse_encoder.fit(texts)
 
     if client.collection_exists(COLLECTION):
         client.delete_collection(COLLECTION)
 
-    client.create_collection(
-        collection_name=COLLECTION,
-        vectors_config={
-            "dense": models.VectorParams(
-                size=dim,
-                distance=models.Distance.COSINE
+    for start in range(0, len(docs), BATCH_SIZE):
+        batch = texts[start:start + BATCH_SIZE]
+        dense = cached_encode(embedder, batch, embed_cache).tolist()
+        sparse = sparse_encoder.encode_documents(batch)
+
+        if start == 0:
+            client.create_collection(
+                collection_name=COLLECTION,
+                vectors_config={
+                    "dense": models.VectorParams(
+                        size=len(dense[0]),
+                        distance=models.Distance.COSINE
+                    )
+                },
+                sparse_vectors_config={
+                    "sparse": sparse_vector_params()
+                }
             )
-        },
-        sparse_vectors_config={
-            "sparse": models.SparseVectorParams(
-                index=models.SparseIndexParams(on_disk=False)
+
+        points = [
+            models.PointStruct(
+                id=start + j,
+                vector={"dense": dense[j], "sparse": sparse[j]},
+                payload=without_text(docs[start + j])
             )
-        }
-    )
-
-    points = [
-        models.PointStruct(
-            id=i,
-            vector={"dense": embeddings[i]},
-            payload={
-                "text": docs[i]["text"],
-                "source": docs[i]["source"]
-            }
-        )
-        for i in range(len(docs))
-    ]
-
-    client.upsert(collection_name=COLLECTION, points=points)
+            for j in range(len(batch))
+        ]
+        client.upsert(collection_name=COLLECTION, points=points)
+
     print("✅ Hybrid collection 建立完成")
 
 
@@ -1,11 +1,37 @@
+import sys
+from pathlib import Path
+
 from qdrant_client import QdrantClient, models
 from sentence_transformers import SentenceTransformer
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.batch_query import batch_query
+from rag_common.chunk_store import ChunkStore
+from rag_common.sparse import SparseBM25Encoder
+
 QDRANT_URL = "http://localhost:6333"
 COLLECTION = "cw04_hybrid_docs"
 
 client = QdrantClient(url=QDRANT_URL)
 embedder = SentenceTransformer("all-MiniLM-L6-v2")
+store = ChunkStore(COLLECTION)         # 依 payload 的 (doc_id, start, end) 取回原文
+sparse_encoder = SparseBM25Encoder()   # 與 embed_to_vdb.py 相同的斷詞與 term id
+
+
+def _prefetch(query, query_vec, top_k):
+    return [
+        models.Prefetch(
+            query=sparse_encoder.encode_query(query),
+            using="sparse",
+            limit=top_k
+        ),
+        models.Prefetch(
+            query=query_vec,
+            using="dense",
+            limit=top_k
+        ),
+    ]
 
 
 def hybrid_retrieve(query: str, top_k: int = 5, top_n: int = 3):
@@ -19,22 +45,7 @@ def hybrid_retrieve(query: str, top_k: int = 5, top_n: int = 3):
     result = client.query_points(
         collection_name=COLLECTION,
 
-        prefetch=[
-            models.Prefetch(
-                query=models.Document(
-                    text=query,
-                    model="Qdrant/bm25"
-                ),
-                using="sparse",
-                limit=top_k
-            ),
-            models.Prefetch(
-                query=query_vec,
-                using="dense",
-                limit=top_k
-            ),
-        ],
-
+        prefetch=_prefetch(query, query_vec, top_k),
 
         query=models.FusionQuery(
             fusion=models.Fusion.RRF
@@ -44,5 +55,27 @@ def hybrid_retrieve(query: str, top_k: int = 5, top_n: int = 3):
         with_payload=True
     )
 
-    return [p.payload["text"] for p in result.points]
+    # 重疊 / 相鄰的 chunk 合併成一段，prompt 不重複送出重疊的文字
+    return store.contexts(result.points)
+
+
+def hybrid_retrieve_batch(queries, top_k: int = 5, top_n: int = 3):
+    """
+    批次版 hybrid_retrieve：dense 向量一次 encode，
+    每批查詢用一次 query_batch_points 送出，依 queries 順序逐題 yield 文字 list
+    """
+    queries = list(queries)
+    query_vecs = embedder.encode(queries)
+
+    requests = [
+        models.QueryRequest(
+            prefetch=_prefetch(q, v.tolist(), top_k),
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            limit=top_n,
+            with_payload=True
+        )
+        for q, v in zip(queries, query_vecs)
+    ]
 
+    for points in batch_query(client, COLLECTION, requests):
+        yield store.contexts(points)
@@ -1,12 +1,23 @@
+import sys
+from pathlib import Path
+
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.rate_limit import get_limiter
+
+LLM_BASE_URL = "https://ws-02.wade0426.me/v1"
+
 llm = ChatOpenAI(
-    base_url="https://ws-02.wade0426.me/v1",
-    api_key="",  
+    base_url=LLM_BASE_URL,
+    api_key="",
     model="google/gemma-3-27b-it",
-    temperature=0
+    temperature=0,
+    max_retries=0
 )
+llm_limiter = get_limiter(LLM_BASE_URL)   # 限速 + 429 / 5xx / 逾時退避重試
 
 def rag_answer(question: str, contexts: list[str]) -> str:
     prompt = f"""
@@ -18,6 +29,6 @@ def rag_answer(question: str, contexts: list[str]) -> str:
 問題：
 {question}
 """
-    resp = llm.invoke([HumanMessage(content=prompt)])
+    resp = llm_limiter.call(llm.invoke, [HumanMessage(content=prompt)])
     return resp.content.strip()
 
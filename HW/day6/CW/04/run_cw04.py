@@ -1,32 +1,56 @@
 import csv
-from hybrid_retrieve import hybrid_retrieve
+import sys
+from pathlib import Path
+
+from hybrid_retrieve import hybrid_retrieve, hybrid_retrieve_batch
 from rag_answer import rag_answer
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.async_batch import Stage, run_stages
+from rag_common.rate_limit import print_stats
+
 QUESTIONS_CSV = "questions.csv"
+BATCH_RETRIEVE = True   # ⭐ True：同時在等檢索的問題一次 embed + query_batch_points；False：逐題查詢
+LIMITS = {"llm": 8, "local": 1}   # ⭐ 每個後端同時進行的呼叫數
 
 def main():
     with open(QUESTIONS_CSV, encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
+        questions = [{"question": r["題目"]} for r in csv.DictReader(f)]
 
-        for i, r in enumerate(reader, start=1):
-            question = r["題目"]
+    if BATCH_RETRIEVE:
+        retrieve_stage = Stage(
+            "contexts",
+            batch_fn=lambda cs: list(
+                hybrid_retrieve_batch([c["question"] for c in cs], top_k=5, top_n=3)
+            ),
+            backend="local"
+        )
+    else:
+        retrieve_stage = Stage(
+            "contexts",
+            lambda c: hybrid_retrieve(query=c["question"], top_k=5, top_n=3),
+            backend="local"
+        )
 
-            print(f"\nQ{i}: {question}")
+    # 檢索 → 回答 流水線，不同題目同時進行；結果依題目順序回傳
+    results = run_stages(questions, [
+        retrieve_stage,
+        Stage("answer", lambda c: rag_answer(c["question"], c["contexts"]), backend="llm"),
+    ], LIMITS)
 
-            contexts = hybrid_retrieve(
-                query=question,
-                top_k=5,   
-                top_n=3
-            )
+    for i, r in enumerate(results, start=1):
 
-            print(f"Retrieved {len(contexts)} chunks")
+        print(f"\nQ{i}: {r['question']}")
 
-            answer = rag_answer(question, contexts)
+        print(f"Retrieved {len(r['contexts'])} passages（重疊 chunk 已合併）")
 
-            print("Answer:")
-            print(answer)
+        print("Answer:")
+        print(r["answer"])
+
+    print()
+    print_stats()
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,76 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.fusion import dense_scores, fuse, minmax
+
+# ============================================================
+# 基本設定
+# ============================================================
+N_DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+DIM = int(sys.argv[2]) if len(sys.argv) > 2 else 384     # all-MiniLM-L6-v2
+N_QUERIES = 32
+TOP_K = 5
+BM25_HIT_RATE = 0.01       # 每個查詢約 1% 文件有 BM25 分數
+
+
+def normalized(x):
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+# ============================================================
+# 原本 hybrid_search 的寫法（每次一個查詢）
+# ============================================================
+def old_hybrid_search(bm25_scores, q_emb, corpus_embeddings, top_k=TOP_K):
+    dense = cosine_similarity(q_emb, corpus_embeddings)[0]
+    scores = 0.5 * bm25_scores + 0.5 * dense
+    return np.argsort(scores)[::-1][:top_k]
+
+
+# ============================================================
+# Main
+# ============================================================
+def main():
+    rng = np.random.default_rng(0)
+    print(f"文件數 {N_DOCS:,}，維度 {DIM}，查詢 {N_QUERIES} 個")
+
+    corpus_embeddings = normalized(rng.standard_normal((N_DOCS, DIM), dtype=np.float32))
+    queries = normalized(rng.standard_normal((N_QUERIES, DIM), dtype=np.float32))
+
+    bm25 = np.zeros((N_QUERIES, N_DOCS), dtype=np.float32)
+    hits = int(N_DOCS * BM25_HIT_RATE)
+    for i in range(N_QUERIES):
+        bm25[i, rng.integers(0, N_DOCS, hits)] = rng.random(hits, dtype=np.float32) * 20
+
+    _, t_old = timed(lambda: [
+        old_hybrid_search(bm25[i], queries[i:i + 1], corpus_embeddings)
+        for i in range(N_QUERIES)
+    ])
+    print(f"原本 hybrid_search（逐題 + cosine_similarity + argsort）：{t_old:7.3f}s")
+
+    for method in ["minmax", "zscore", "rrf"]:
+        (idx, _), t_new = timed(lambda: fuse(
+            [bm25, dense_scores(queries, corpus_embeddings)], method=method, k=TOP_K
+        ))
+        print(f"fuse({method:6s}) 批次：{t_new:7.3f}s  → {t_old / t_new:5.1f}x")
+
+    # 正確性：argpartition 的結果與整列排序相同
+    dense = dense_scores(queries, corpus_embeddings)
+    (idx, _), _ = timed(lambda: fuse([bm25, dense], method="minmax", k=TOP_K))
+    ref = np.argsort(-(0.5 * minmax(bm25) + 0.5 * minmax(dense)), axis=1, kind="stable")[:, :TOP_K]
+    assert (idx == ref).all(), "minmax top-k 與完整排序不一致"
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,19 @@
 import csv
 import re
+import sys
 import numpy as np
+from pathlib import Path
 from typing import List
 
 from langchain_openai import ChatOpenAI
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from rank_bm25 import BM25Okapi
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.async_batch import Stage, run_stages
+from rag_common.bm25 import BM25Index, cjk_bigrams
+from rag_common.fusion import dense_scores, fuse, top_k as top_k_rows
+from rag_common.rate_limit import get_limiter, print_stats
 
 # ============================================================
 # 基本設定
@@ -15,13 +22,22 @@ from rank_bm25 import BM25Okapi
 QA_PATH = "qa_data.txt"
 QUESTION_PATH = "questions.csv"
 OUTPUT_CSV = "day6_HW_questions.csv"
+FUSION = "minmax"              # ⭐ 分數融合方式：minmax / zscore / rrf
+CANDIDATE_POOL = 50            # ⭐ BM25 與 dense 各取前幾名，只在候選聯集上融合
+BM25_TOKENIZER = cjk_bigrams   # ⭐ 中文用字元 bigram；裝了 jieba 可改成 rag_common.bm25.jieba_tokenize
+LIMITS = {"llm": 8, "local": 1}  # ⭐ batch_answer 每個後端同時進行的呼叫數
 
+LLM_BASE_URL = "https://ws-02.wade0426.me/v1"
+
+# 重試交給共用的 limiter（AIMD 限速 + 指數退避），ChatOpenAI 本身不重試
 llm = ChatOpenAI(
-    base_url="https://ws-02.wade0426.me/v1",
+    base_url=LLM_BASE_URL,
     api_key="",
     model="google/gemma-3-27b-it",
-    temperature=0.1
+    temperature=0.1,
+    max_retries=0
 )
+llm_limiter = get_limiter(LLM_BASE_URL)
 
 embed_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 
@@ -85,9 +101,8 @@ corpus = [item["q"] + " " + item["a"] for item in qa_data]
 if not corpus:
     raise ValueError("❌ QA corpus 為空，請確認 qa_data.txt 是否有內容")
 
-# BM25
-tokenized = [doc.split() for doc in corpus]
-bm25 = BM25Okapi(tokenized)
+# BM25（倒排索引，查詢時只走查詢詞的 postings）
+bm25 = BM25Index(corpus, tokenizer=BM25_TOKENIZER)
 
 # Dense
 corpus_embeddings = embed_model.encode(
@@ -110,24 +125,39 @@ def rewrite_query(query: str, history: List[str]) -> str:
 
 請只輸出改寫後的問題。
 """
-    return llm.invoke(prompt).content.strip()
+    return llm_limiter.call(llm.invoke, prompt).content.strip()
 
 # ============================================================
 # Hybrid Search
 # ============================================================
 
-def hybrid_search(query: str, top_k=5):
-    bm25_scores = bm25.get_scores(query.split())
-
-    q_emb = embed_model.encode([query], normalize_embeddings=True)
-    dense_scores = cosine_similarity(
-        q_emb, corpus_embeddings
-    )[0]
-
-    scores = 0.5 * bm25_scores + 0.5 * dense_scores
-    top_idx = np.argsort(scores)[::-1][:top_k]
+def hybrid_search_batch(queries: List[str], top_k=5):
+    """
+    多個查詢一次算：BM25 與 dense 各取前 CANDIDATE_POOL 名，在候選聯集上正規化後融合（FUSION）
+
+    - BM25 走 MaxScore 的 top_k，不產生整個語料長度的分數陣列，耗時跟著結果數量而不是語料大小
+    - 聯集裡只被 dense 找到的文件，用 score_docs 補上確切的 BM25 分數（反之直接取 dense 分數）
+    - corpus_embeddings 已正規化，cosine 直接用 matmul
+    """
+    q_emb = embed_model.encode(queries, normalize_embeddings=True)
+    dense = dense_scores(q_emb, corpus_embeddings)
+    dense_top, _ = top_k_rows(dense, CANDIDATE_POOL)
+
+    results = []
+    for q, dense_row, dense_ids in zip(queries, dense, dense_top):
+        sparse_ids = [i for i, _ in bm25.top_k(q, k=CANDIDATE_POOL)]
+        cand = np.union1d(np.asarray(sparse_ids, dtype=np.int64), dense_ids)
+
+        idx, _ = fuse(
+            [bm25.score_docs(q, cand)[None], dense_row[cand][None]],
+            method=FUSION,
+            k=top_k
+        )
+        results.append([(int(cand[i]), corpus[cand[i]]) for i in idx[0].tolist()])
+    return results
 
-    return [(i, corpus[i]) for i in top_idx]
+def hybrid_search(query: str, top_k=5):
+    return hybrid_search_batch([query], top_k)[0]
 
 # ============================================================
 # Rerank（LLM）
@@ -153,7 +183,7 @@ def rerank(query: str, docs: List[str]) -> str:
 請直接給出完整、自然的客服回答，不要提到「資料中沒有」這種描述。
 """
 
-    return llm.invoke(prompt).content.strip()
+    return llm_limiter.call(llm.invoke, prompt).content.strip()
 
 
 # ============================================================
@@ -183,26 +213,37 @@ def chat():
 # ============================================================
 
 def batch_answer():
-    rows = []
-
     with open(QUESTION_PATH, encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rewritten = rewrite_query(row["questions"], [])
-            hits = hybrid_search(rewritten)
-            docs = [d for _, d in hits]
-            answer = rerank(rewritten, docs)
-
-            rows.append({
-                "q_id": row["q_id"],
-                "questions": row["questions"],
-                "answer": answer,
-                "Faithfulness": "",
-                "Answer_Relevancy": "",
-                "Contextual_Recall": "",
-                "Contextual_Precision": "",
-                "Contextual_Relevancy": ""
-            })
+        questions = list(csv.DictReader(f))
+
+    # rewrite → 檢索 → 回答 流水線：不同題目同時進行，LLM 呼叫數受 LIMITS 限制，
+    # 同時在等檢索的題目合成一批 hybrid_search_batch；結果依 q_id 原順序回傳
+    results = run_stages(questions, [
+        Stage("rewritten", lambda c: rewrite_query(c["questions"], []), backend="llm"),
+        Stage(
+            "docs",
+            batch_fn=lambda cs: [
+                [d for _, d in hits]
+                for hits in hybrid_search_batch([c["rewritten"] for c in cs])
+            ],
+            backend="local"
+        ),
+        Stage("answer", lambda c: rerank(c["rewritten"], c["docs"]), backend="llm"),
+    ], LIMITS)
+
+    rows = [
+        {
+            "q_id": r["q_id"],
+            "questions": r["questions"],
+            "answer": r["answer"],
+            "Faithfulness": "",
+            "Answer_Relevancy": "",
+            "Contextual_Recall": "",
+            "Contextual_Precision": "",
+            "Contextual_Relevancy": ""
+        }
+        for r in results
+    ]
 
     with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=rows[0].keys())
@@ -210,6 +251,7 @@ def batch_answer():
         writer.writerows(rows)
 
     print("✅ day6_HW_questions.csv 已產生")
+    print_stats()
 
 # ============================================================
 # Main
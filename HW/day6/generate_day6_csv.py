@@ -1,9 +1,9 @@
+import asyncio
 import csv
 import random
-import time
+import sys
+from pathlib import Path
 
-from openai import OpenAI
-from deepeval.models import DeepEvalBaseLLM
 from deepeval.metrics import (
     FaithfulnessMetric,
     AnswerRelevancyMetric,
@@ -13,6 +13,12 @@ from deepeval.metrics import (
 )
 from deepeval.test_case import LLMTestCase
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common.eval_runner import evaluate
+from rag_common.judge import JudgeLLM
+from rag_common.rate_limit import print_stats
+
 
 # ======================
 # 基本設定
@@ -20,59 +26,35 @@ from deepeval.test_case import LLMTestCase
 INPUT_CSV = "day6_HW_questions.csv"
 OUTPUT_CSV = "day6_HW_results.csv"
 
-SAMPLE_SIZE = 5          # ⭐ 每次隨機抽幾題
-SLEEP_BEFORE_LLM = 1     # ⭐ 每次問 LLM 前休息秒數
-SLEEP_AFTER_LLM = 1      # ⭐ 每次問完 LLM 後休息秒數
-
-
-# ======================
-# 自訂 Llama.cpp LLM
-# ======================
-class LlamaCppModel(DeepEvalBaseLLM):
-    def __init__(
-        self,
-        base_url="https://ws-06.huannago.com/v1",
-        model_name="google/gemma-3-27b-it"
-    ):
-        self.base_url = base_url
-        self.model_name = model_name
-
-    def load_model(self):
-        return OpenAI(
-            api_key="NoNeed",
-            base_url=self.base_url
-        )
-
-    def generate(self, prompt: str) -> str:
-        client = self.load_model()
-        response = client.chat.completions.create(
-            model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-        )
-        return response.choices[0].message.content
-
-    async def a_generate(self, prompt: str) -> str:
-        return self.generate(prompt)
-
-    def get_model_name(self):
-        return f"Llama.cpp ({self.model_name})"
+SAMPLE_SIZE = None       # ⭐ 隨機抽幾題；None = 全部題目
+SEED = 0                 # ⭐ 抽樣種子固定，續跑時抽到同一批題目
+MAX_CONCURRENCY = 16     # ⭐ 同時評估的 (題目 × metric) 工作數
+RATE = 4                 # ⭐ judge 的初始每秒請求數；之後依 429 / 逾時自動調整（AIMD）
+TIME_BUDGET = None       # ⭐ 評估時間上限（秒）；時間到就停，下次執行從進度檔續跑
+RESUME = True            # ⭐ True：沿用上次的回答與已完成的分數
+JUDGE_CACHE = True       # ⭐ True：metric + judge 看到的內容沒變就沿用快取分數（.cache/judge）
 
 
 # ======================
-# 初始化 LLM
+# 初始化 LLM（共用連線池的 judge model，見 rag_common/judge.py）
 # ======================
-custom_llm = LlamaCppModel()
+custom_llm = JudgeLLM(
+    base_url="https://ws-06.huannago.com/v1",
+    model_name="google/gemma-3-27b-it",
+    rate=RATE
+)
 
 
 # ======================
-# Metrics
+# Metrics（每個評估工作各自建立，metric 物件會記住分數，不能共用）
 # ======================
-faithfulness = FaithfulnessMetric(model=custom_llm)
-answer_rel = AnswerRelevancyMetric(model=custom_llm)
-context_recall = ContextualRecallMetric(model=custom_llm)
-context_precision = ContextualPrecisionMetric(model=custom_llm)
-context_relevancy = ContextualRelevancyMetric(model=custom_llm)
+METRICS = {
+    "Faithfulness": lambda: FaithfulnessMetric(model=custom_llm),
+    "Answer_Relevancy": lambda: AnswerRelevancyMetric(model=custom_llm),
+    "Contextual_Recall": lambda: ContextualRecallMetric(model=custom_llm),
+    "Contextual_Precision": lambda: ContextualPrecisionMetric(model=custom_llm),
+    "Contextual_Relevancy": lambda: ContextualRelevancyMetric(model=custom_llm),
+}
 
 
 # ======================
@@ -90,93 +72,77 @@ DEFAULT_CONTEXT = [
 with open(INPUT_CSV, newline="", encoding="utf-8") as fin:
     rows = list(csv.DictReader(fin))
 
-sampled_rows = random.sample(rows, min(SAMPLE_SIZE, len(rows)))
+if SAMPLE_SIZE:
+    rows = random.Random(SEED).sample(rows, min(SAMPLE_SIZE, len(rows)))
 
-print("\n🎯 本次隨機抽到的題目 ID：")
-print([row["q_id"] for row in sampled_rows])
+print("\n🎯 本次評估的題目 ID：")
+print([row["q_id"] for row in rows])
 print("=" * 80)
 
 
 # ======================
-# 開始評估
+# 產生回答（同時送出；續跑時沿用上次輸出的回答，分數才對得上）
 # ======================
-with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as fout:
-    fieldnames = [
-        "q_id",
-        "questions",
-        "answer",
-        "Faithfulness",
-        "Answer_Relevancy",
-        "Contextual_Recall",
-        "Contextual_Precision",
-        "Contextual_Relevancy"
-    ]
-    writer = csv.DictWriter(fout, fieldnames=fieldnames)
-    writer.writeheader()
-
-    for idx, row in enumerate(sampled_rows, start=1):
-        print(f"\n🟦 第 {idx} 題開始")
-        print("-" * 80)
-
-        question = row["questions"]
-        print("❓ Question:")
-        print(question)
-
-        # ---- 呼叫 LLM（慢慢來）----
-        print("\n⏳ 等待 LLM 回答中...")
-        time.sleep(SLEEP_BEFORE_LLM)
+def load_previous_answers():
+    if not (RESUME and Path(OUTPUT_CSV).exists()):
+        return {}
+    with open(OUTPUT_CSV, newline="", encoding="utf-8") as f:
+        return {r["q_id"]: r["answer"] for r in csv.DictReader(f) if r["answer"] != "LLM Error"}
+
 
+async def generate_answers(questions):
+    async def one(q):
         try:
-            answer = custom_llm.generate(question)
+            return await custom_llm.a_generate(q)
         except Exception as e:
             print("❌ LLM 發生錯誤，跳過此題")
             print(e)
-            answer = "LLM Error"
+            return "LLM Error"
+    return await asyncio.gather(*(one(q) for q in questions))
 
-        time.sleep(SLEEP_AFTER_LLM)
 
-        print("\n🤖 LLM Answer:")
-        print(answer)
+answers = load_previous_answers()
+todo = [row for row in rows if row["q_id"] not in answers]
+print(f"\n⏳ 等待 LLM 回答中...（{len(todo)} 題，沿用 {len(rows) - len(todo)} 題）")
+for row, answer in zip(todo, asyncio.run(generate_answers([r["questions"] for r in todo]))):
+    answers[row["q_id"]] = answer
 
-        # ---- 建立測試案例 ----
-        test_case = LLMTestCase(
-            input=question,
-            actual_output=answer,
-            expected_output=answer,
+
+# ======================
+# 開始評估（題目 × metric 同時進行，分數一完成就寫進進度檔）
+# ======================
+def print_case(q_id, scores):
+    print(f"\n📊 q_id={q_id} Metric Scores:")
+    for name, score in scores.items():
+        print(f"{name:22s}: {score:.3f}" if score != "" else f"{name:22s}: -")
+
+
+cases = [
+    (
+        row["q_id"],
+        LLMTestCase(
+            input=row["questions"],
+            actual_output=answers[row["q_id"]],
+            expected_output=answers[row["q_id"]],
             retrieval_context=DEFAULT_CONTEXT
-        )
-
-        # ---- 評估 ----
-        faithfulness.measure(test_case)
-        answer_rel.measure(test_case)
-        context_recall.measure(test_case)
-        context_precision.measure(test_case)
-        context_relevancy.measure(test_case)
-
-        print("\n📊 Metric Scores:")
-        print(f"Faithfulness           : {faithfulness.score:.3f}")
-        print(f"Answer Relevancy       : {answer_rel.score:.3f}")
-        print(f"Contextual Recall      : {context_recall.score:.3f}")
-        print(f"Contextual Precision   : {context_precision.score:.3f}")
-        print(f"Contextual Relevancy   : {context_relevancy.score:.3f}")
-
-        # ---- 寫入 CSV ----
-        writer.writerow({
-            "q_id": row["q_id"],
-            "questions": question,
-            "answer": answer,
-            "Faithfulness": round(faithfulness.score, 3),
-            "Answer_Relevancy": round(answer_rel.score, 3),
-            "Contextual_Recall": round(context_recall.score, 3),
-            "Contextual_Precision": round(context_precision.score, 3),
-            "Contextual_Relevancy": round(context_relevancy.score, 3),
-        })
-
-        print("-" * 80)
-        print(f"🟩 第 {idx} 題完成")
-        time.sleep(1)
+        ),
+        {"q_id": row["q_id"], "questions": row["questions"], "answer": answers[row["q_id"]]}
+    )
+    for row in rows
+]
+
+evaluate(
+    cases,
+    METRICS,
+    OUTPUT_CSV,
+    max_concurrency=MAX_CONCURRENCY,
+    time_budget=TIME_BUDGET,
+    resume=RESUME,
+    judge_cache=JUDGE_CACHE,
+    on_case_done=print_case
+)
 
 
 print("\n✅ 全部評估完成")
+print_stats()
 print(f"📄 結果輸出至：{OUTPUT_CSV}")
-
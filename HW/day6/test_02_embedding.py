@@ -1,36 +1,31 @@
-import requests
+import sys
+from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
 
-API_URL = "https://ws-04.wade0426.me/embed"
+from rag_common.embed_cache import EmbeddingCache
+from rag_common.embedding import EmbeddingClient, EMBED_API_URL
 
+# Embedding API
+API_URL = EMBED_API_URL
 
+# 共用 client：切 batch、連線池、多個 batch 同時送出
+# 已算過的文字直接從本機快取讀取，不再呼叫 API
+_client = EmbeddingClient(url=API_URL, cache=EmbeddingCache(API_URL))
+
+#把embedding變成funtion能重複使用
 
 def get_embeddings(texts, normalize=True):
     """
-    呼叫 embedding API
+    呼叫 embedding API（分 batch、共用連線）
     回傳：
-        embeddings: List[List[float]]
+        embeddings: np.ndarray，shape = (len(texts), vector_size)，float32
         vector_size: int
     """
-    response = requests.post(
-        API_URL,
-        json={
-            "texts": texts,
-            "normalize": normalize
-        }
-    )
-    
-    
-    print("狀態碼：", response.status_code)
+    embeddings = _client.embed(texts, normalize=normalize)
 
-    if response.status_code != 200:
-        raise Exception("Embedding API 呼叫失敗")
-
-    data = response.json()
-    embeddings = data["embeddings"]
-    
     # ⭐ 不寫死，動態取得維度
-    vector_size = len(embeddings[0])
+    vector_size = embeddings.shape[1]
 
     return embeddings, vector_size
     
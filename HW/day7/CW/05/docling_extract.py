@@ -1,12 +1,28 @@
+import sys
+from pathlib import Path
+
 from docling.document_converter import DocumentConverter
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.extract_cache import ExtractionCache
+
 input_pdf = "example.pdf"
 output_md = "example_docling.md"
 
-converter = DocumentConverter()
-doc = converter.convert(input_pdf)
+# 檔案內容沒變就直接用上次的轉換結果
+cache = ExtractionCache("docling", {"export": "markdown"})
+
+
+def convert(path):
+    converter = DocumentConverter()
+    doc = converter.convert(path)
+    return doc.document.export_to_markdown()
+
+
+md_text = cache.get_or_extract(input_pdf, convert)
 
 with open(output_md, "w", encoding="utf-8") as f:
-    f.write(doc.document.export_to_markdown())
+    f.write(md_text)
 
 print("✅ Docling extraction completed.")
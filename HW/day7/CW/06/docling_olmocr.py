@@ -1,3 +1,6 @@
+import sys
+from pathlib import Path
+
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import VlmPipelineOptions
 from docling.datamodel.pipeline_options_vlm_model import (
@@ -7,6 +10,10 @@ from docling.datamodel.pipeline_options_vlm_model import (
 from docling.document_converter import DocumentConverter, PdfFormatOption
 from docling.pipeline.vlm_pipeline import VlmPipeline
 
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.extract_cache import ExtractionCache
+
 
 def remote_vlm_options(
     model: str = "gemma-3-27b-it",
@@ -45,21 +52,34 @@ pipeline_options.vlm_options = remote_vlm_options(
     temperature=0.0,
 )
 
-# === 建立文件轉換器 ===
-doc_converter = DocumentConverter(
-    format_options={
-        InputFormat.PDF: PdfFormatOption(
-            pipeline_options=pipeline_options,
-            pipeline_cls=VlmPipeline,
-        )
-    }
-)
+# === 提取快取：檔案內容、VLM 設定都沒變就不再呼叫遠端模型 ===
+vlm = pipeline_options.vlm_options
+cache = ExtractionCache("docling-vlm", {
+    "url": vlm.url,
+    "params": vlm.params,
+    "prompt": vlm.prompt,
+    "scale": vlm.scale,
+    "temperature": vlm.temperature,
+})
+
+
+def convert(path):
+    # === 建立文件轉換器 ===
+    doc_converter = DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options,
+                pipeline_cls=VlmPipeline,
+            )
+        }
+    )
+
+    # === 轉換 PDF → 匯出 Markdown ===
+    result = doc_converter.convert(path)
+    return result.document.export_to_markdown()
 
-# === 轉換 PDF ===
-result = doc_converter.convert("sample_table.pdf")
 
-# === 匯出 Markdown ===
-md_text = result.document.export_to_markdown()
+md_text = cache.get_or_extract("sample_table.pdf", convert)
 
 with open("output_olmocr.md", "w", encoding="utf-8") as f:
     f.write(md_text)
@@ -1,3 +1,6 @@
+import sys
+from pathlib import Path
+
 from docling.datamodel.base_models import InputFormat
 from docling.datamodel.pipeline_options import (
     PdfPipelineOptions,
@@ -5,27 +8,39 @@ from docling.datamodel.pipeline_options import (
 )
 from docling.document_converter import DocumentConverter, PdfFormatOption
 
-# === OCR Pipeline 設定（IDP 流程）===
-pipeline_options = PdfPipelineOptions(
-    do_ocr=True,
-    ocr_options=RapidOcrOptions(
-        lang=["ch", "en"]
-    )
-)
+sys.path.append(str(Path(__file__).resolve().parents[4]))
+
+from rag_common.extract_cache import ExtractionCache
+
+OCR_LANG = ["ch", "en"]
+
+# === 提取快取：檔案內容、OCR 設定都沒變就不重跑 ===
+cache = ExtractionCache("docling-rapidocr", {"do_ocr": True, "lang": OCR_LANG})
 
-doc_converter = DocumentConverter(
-    format_options={
-        InputFormat.PDF: PdfFormatOption(
-            pipeline_options=pipeline_options
+
+def convert(path):
+    # === OCR Pipeline 設定（IDP 流程）===
+    pipeline_options = PdfPipelineOptions(
+        do_ocr=True,
+        ocr_options=RapidOcrOptions(
+            lang=OCR_LANG
         )
-    }
-)
+    )
+
+    doc_converter = DocumentConverter(
+        format_options={
+            InputFormat.PDF: PdfFormatOption(
+                pipeline_options=pipeline_options
+            )
+        }
+    )
+
+    # === 轉換 PDF → 匯出成 Markdown ===
+    result = doc_converter.convert(path)
+    return result.document.export_to_markdown()
 
-# === 轉換 PDF ===
-result = doc_converter.convert("sample_table.pdf")
 
-# === 匯出成 Markdown ===
-md_text = result.document.export_to_markdown()
+md_text = cache.get_or_extract("sample_table.pdf", convert)
 
 # === 寫入 md 檔案 ===
 with open("output_rapidocr.md", "w", encoding="utf-8") as f:
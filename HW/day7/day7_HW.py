@@ -1,20 +1,14 @@
 import os
 import re
 import csv
+import sys
 import requests
+import numpy as np
 from pathlib import Path
 
-import pytesseract
-import pdfplumber
-from pdf2image import convert_from_path
-from docx import Document
-
 from openai import OpenAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-
 from deepeval.metrics import (
     FaithfulnessMetric,
     AnswerRelevancyMetric,
@@ -22,7 +16,15 @@ from deepeval.metrics import (
     ContextualPrecisionMetric,
 )
 from deepeval.test_case import LLMTestCase
-from deepeval.models import DeepEvalBaseLLM
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common import idp
+from rag_common.eval_runner import evaluate
+from rag_common.judge import JudgeLLM
+from rag_common.embedding import embed_limiter as embedding_limiter
+from rag_common.local_index import corpus_hashes, open_local_index
+from rag_common.rate_limit import get_limiter, print_stats
 
 
 # ─────────────────────────────
@@ -36,61 +38,32 @@ LLM_BASE_URL = "https://ws-06.huannago.com/v1"
 LLM_MODEL = "gemma-3-27b-it"
 LLM_API_KEY = "NoNeed"
 
-client = OpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY)
+# 重試交給共用的 limiter（與 DeepEval judge 同一個服務、同一個桶），client 本身不重試
+client = OpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY, max_retries=0)
+llm_limiter = get_limiter(LLM_BASE_URL)
+embed_limiter = embedding_limiter(EMBED_URL)
 
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 TOP_K = 5
 MAX_SAMPLES = 5   # ⭐ 限制前 5 筆
+EVAL_CSV = BASE_DIR / "day7_HW_scores.csv"   # ⭐ DeepEval 分數（進度逐筆寫入 day7_HW_scores.jobs.csv，可續跑）
+EVAL_CONCURRENCY = 16   # ⭐ 同時評估的 (題目 × metric) 工作數
+EVAL_TIME_BUDGET = None  # ⭐ 評估時間上限（秒），時間到就停，下次執行續跑
+EVAL_JUDGE_CACHE = True  # ⭐ judge 結果快取：只換 retriever 時，context 沒變的題目不重新評分
+
+DOC_FILES = ["1.pdf", "2.pdf", "3.pdf", "4.png", "5.docx"]
+INGEST_WORKERS = os.cpu_count()   # ⭐ 平行載入文件的 process 數，設 1 則逐一處理
+INDEX_NAME = "day7_HW"            # ⭐ 本地索引存在 .cache/qdrant/day7_HW，文件沒變就直接沿用
 
 
 # ═══════════════════════════════
 # IDP 文件提取
 # ═══════════════════════════════
 
-def extract_pdf_text(path):
-    texts = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                texts.append(t)
-    return "\n".join(texts)
-
-def extract_pdf_ocr(path):
-    images = convert_from_path(path, dpi=200)
-    texts = []
-    for img in images:
-        texts.append(pytesseract.image_to_string(img, lang="chi_tra+eng"))
-    return "\n".join(texts)
-
-def extract_image(path):
-    from PIL import Image
-    img = Image.open(path)
-    return pytesseract.image_to_string(img, lang="chi_tra+eng")
-
-def extract_docx(path):
-    doc = Document(path)
-    return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
-
 def load_documents():
-    docs = {}
-    for f in ["1.pdf", "2.pdf", "3.pdf", "4.png", "5.docx"]:
-        path = BASE_DIR / f
-        if not path.exists():
-            continue
-
-        if f.endswith(".pdf"):
-            text = extract_pdf_text(path)
-            if len(text.strip()) < 100:
-                text = extract_pdf_ocr(path)
-        elif f.endswith(".png"):
-            text = extract_image(path)
-        elif f.endswith(".docx"):
-            text = extract_docx(path)
-
-        docs[f] = text
-    return docs
+    # 檔案之間、OCR 的 PDF 頁面之間都用 process pool 平行處理
+    return idp.load_documents(BASE_DIR, DOC_FILES, max_workers=INGEST_WORKERS)
 
 
 # ═══════════════════════════════
@@ -129,39 +102,51 @@ def split_text(text, source):
     return [{"text": c, "source": source} for c in chunks]
 
 def embed(texts):
-    r = requests.post(
-        EMBED_URL,
-        json={"texts": texts, "task_description": "qa", "normalize": True},
-        timeout=150
-    )
-    return r.json()["embeddings"]
-
-def build_index(chunks):
-    client_q = QdrantClient(":memory:")
-    test_vec = embed(["test"])[0]
-    dim = len(test_vec)
-
-    client_q.create_collection(
-        collection_name="docs",
-        vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
-    )
+    def post():
+        r = requests.post(
+            EMBED_URL,
+            json={"texts": texts, "task_description": "qa", "normalize": True},
+            timeout=150
+        )
+        r.raise_for_status()
+        return r.json()["embeddings"]
+    return embed_limiter.call(post)
 
-    vectors = embed([c["text"] for c in chunks])
+def prepare_chunks():
+    print("📄 載入文件...")
+    docs = load_documents()
 
-    points = [
-        PointStruct(
-            id=i,
-            vector=v,
-            payload={
-                "text": chunks[i]["text"],
-                "source": chunks[i]["source"]
-            }
-        )
-        for i, v in enumerate(vectors)
-    ]
+    print("🔍 檢測 Injection...")
+    clean_docs = {}
+    for name, text in docs.items():
+        if detect_injection(text):
+            print(f"❌ 發現惡意提示詞: {name} → 剃除")
+        else:
+            clean_docs[name] = text
 
-    client_q.upsert("docs", points)
-    return client_q
+    print("✂️ 切塊...")
+    all_chunks = []
+    for name, text in clean_docs.items():
+        all_chunks += split_text(text, name)
+    return all_chunks
+
+def build_index():
+    # 文件內容、切塊與 embedding 設定都沒變 → 直接開啟上次的索引
+    config = {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embed_url": EMBED_URL,
+        "idp": idp.IDP_OPTIONS,
+        "injection_patterns": PATTERNS,
+    }
+    return open_local_index(
+        INDEX_NAME,
+        "docs",
+        corpus_hashes(BASE_DIR, DOC_FILES),
+        prepare_chunks,
+        lambda texts: np.asarray(embed(texts), dtype=np.float32),
+        config=config
+    )
 
 def search(client_q, query):
     q_vec = embed([query])[0]
@@ -174,7 +159,8 @@ def generate_answer(query, contexts):
         {"role": "system", "content": "根據資料回答問題，不可編造。"},
         {"role": "user", "content": f"資料:\n{ctx}\n\n問題:{query}"}
     ]
-    resp = client.chat.completions.create(
+    resp = llm_limiter.call(
+        client.chat.completions.create,
         model=LLM_MODEL,
         messages=msg,
         temperature=0
@@ -186,24 +172,14 @@ def generate_answer(query, contexts):
 # DeepEval
 # ═══════════════════════════════
 
-class CustomLLM(DeepEvalBaseLLM):
-
-    def load_model(self):
-        return None
-
-    def generate(self, prompt: str):
-        resp = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        return resp.choices[0].message.content
-
-    async def a_generate(self, prompt: str):
-        return self.generate(prompt)
-
-    def get_model_name(self):
-        return LLM_MODEL
+# CustomLLM 改用共用的 JudgeLLM：連線池重複使用、a_generate 為真正的非同步呼叫
+def judge_model():
+    return JudgeLLM(
+        base_url=LLM_BASE_URL,
+        model_name=LLM_MODEL,
+        api_key=LLM_API_KEY,
+        temperature=0
+    )
 
 
 # ═══════════════════════════════
@@ -212,24 +188,8 @@ class CustomLLM(DeepEvalBaseLLM):
 
 def main():
 
-    print("📄 載入文件...")
-    docs = load_documents()
-
-    print("🔍 檢測 Injection...")
-    clean_docs = {}
-    for name, text in docs.items():
-        if detect_injection(text):
-            print(f"❌ 發現惡意提示詞: {name} → 剃除")
-        else:
-            clean_docs[name] = text
-
-    print("✂️ 切塊...")
-    all_chunks = []
-    for name, text in clean_docs.items():
-        all_chunks += split_text(text, name)
-
     print("📦 建立向量庫...")
-    qdrant_client = build_index(all_chunks)
+    qdrant_client = build_index()
 
     qa_data = []
     with open(BASE_DIR / "questions_answer.csv", "r", encoding="utf-8-sig") as f:
@@ -239,17 +199,19 @@ def main():
                 break
             qa_data.append(row)
 
-    custom_llm = CustomLLM()
+    custom_llm = judge_model()
 
-    metrics = [
-        FaithfulnessMetric(model=custom_llm),
-        AnswerRelevancyMetric(model=custom_llm),
-        ContextualRecallMetric(model=custom_llm),
-        ContextualPrecisionMetric(model=custom_llm),
-    ]
+    # 每個評估工作各自建立 metric（metric 物件會記住分數，不能同時共用）
+    metrics = {
+        "Faithfulness": lambda: FaithfulnessMetric(model=custom_llm),
+        "AnswerRelevancy": lambda: AnswerRelevancyMetric(model=custom_llm),
+        "ContextualRecall": lambda: ContextualRecallMetric(model=custom_llm),
+        "ContextualPrecision": lambda: ContextualPrecisionMetric(model=custom_llm),
+    }
 
     print("🚀 執行 RAG + DeepEval...")
 
+    cases = []
     for row in qa_data:
 
         query = row["questions"]
@@ -262,18 +224,27 @@ def main():
             expected_output=row["answer"],
             retrieval_context=[c.payload["text"] for c in contexts]
         )
+        cases.append((row["id"], test_case, {"q_id": row["id"], "questions": query, "answer": answer}))
 
-        for m in metrics:
-            m.measure(test_case)
-
+    def print_case(q_id, scores):
+        case = next(tc for cid, tc, _ in cases if str(cid) == q_id)
         print("\n" + "=" * 60)
-        print(f"Q: {query}")
-        print(f"A: {answer}")
+        print(f"Q: {case.input}")
+        print(f"A: {case.actual_output}")
         print("Scores:")
-        print("Faithfulness:", metrics[0].score)
-        print("AnswerRelevancy:", metrics[1].score)
-        print("ContextualRecall:", metrics[2].score)
-        print("ContextualPrecision:", metrics[3].score)
+        for name, score in scores.items():
+            print(f"{name}:", score)
+
+    # (題目 × metric) 同時評估，分數一完成就寫進進度檔
+    evaluate(
+        cases,
+        metrics,
+        EVAL_CSV,
+        max_concurrency=EVAL_CONCURRENCY,
+        time_budget=EVAL_TIME_BUDGET,
+        judge_cache=EVAL_JUDGE_CACHE,
+        on_case_done=print_case
+    )
 
     print("\n📄 產生 test_dataset.csv...")
 
@@ -308,6 +279,7 @@ def main():
         writer.writerows(rows)
 
     print("✅ test_dataset.csv 產生完成")
+    print_stats()
     print("🎉 作業完成")
 
 
@@ -1,18 +1,18 @@
 import os
+import sys
 from pathlib import Path
 import requests
-
-import pytesseract
-import pdfplumber
-from pdf2image import convert_from_path
-from docx import Document
-from PIL import Image
+import numpy as np
 
 from openai import OpenAI
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from rag_common import idp
+from rag_common.embedding import embed_limiter as embedding_limiter
+from rag_common.local_index import corpus_hashes, open_local_index
+from rag_common.rate_limit import get_limiter, print_stats
 
 
 # =========================
@@ -26,84 +26,31 @@ EMBED_URL = "https://ws-04.wade0426.me/embed"
 LLM_BASE_URL = "https://ws-06.huannago.com/v1"
 LLM_MODEL = "gemma-3-27b-it"
 
+# 重試交給共用的 limiter（AIMD 限速 + 指數退避），client 本身不重試
 client = OpenAI(
     base_url=LLM_BASE_URL,
-    api_key="NoNeed"
+    api_key="NoNeed",
+    max_retries=0
 )
+llm_limiter = get_limiter(LLM_BASE_URL)
+embed_limiter = embedding_limiter(EMBED_URL)
 
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 TOP_K = 5
 
+DOC_FILES = ["1.pdf", "2.pdf", "3.pdf", "4.png", "5.docx"]
+INGEST_WORKERS = os.cpu_count()   # ⭐ 平行載入文件的 process 數，設 1 則逐一處理
+INDEX_NAME = "day7_ai"            # ⭐ 本地索引存在 .cache/qdrant/day7_ai，文件沒變就直接沿用
+
 
 # =========================
 # IDP 文件讀取
 # =========================
 
-def extract_pdf_text(path):
-    texts = []
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            t = page.extract_text()
-            if t:
-                texts.append(t)
-    return "\n".join(texts)
-
-
-def extract_pdf_ocr(path):
-    images = convert_from_path(path, dpi=200)
-    texts = []
-    for img in images:
-        texts.append(
-            pytesseract.image_to_string(img, lang="chi_tra+eng")
-        )
-    return "\n".join(texts)
-
-
-def extract_image(path):
-    img = Image.open(path)
-    return pytesseract.image_to_string(img, lang="chi_tra+eng")
-
-
-def extract_docx(path):
-    doc = Document(path)
-    return "\n".join(
-        [p.text for p in doc.paragraphs if p.text.strip()]
-    )
-
-
 def load_documents():
-    docs = {}
-
-    for f in ["1.pdf", "2.pdf", "3.pdf", "4.png", "5.docx"]:
-
-        path = BASE_DIR / f
-        if not path.exists():
-            continue
-
-        print(f"📄 讀取 {f}")
-
-        if f.endswith(".pdf"):
-            text = extract_pdf_text(path)
-
-            # 如果 PDF 幾乎沒抓到字 → 改 OCR
-            if len(text.strip()) < 100:
-                print("   → 文字太少，改用 OCR")
-                text = extract_pdf_ocr(path)
-
-        elif f.endswith(".png"):
-            text = extract_image(path)
-
-        elif f.endswith(".docx"):
-            text = extract_docx(path)
-
-        else:
-            text = ""
-
-        print(f"   → OK ({len(text)} chars)")
-        docs[f] = text
-
-    return docs
+    # 檔案之間、OCR 的 PDF 頁面之間都用 process pool 平行處理
+    return idp.load_documents(BASE_DIR, DOC_FILES, max_workers=INGEST_WORKERS)
 
 
 # =========================
@@ -130,55 +77,65 @@ def split_text(text, source):
 
 def embed(texts):
 
-    r = requests.post(
-        EMBED_URL,
-        json={
-            "texts": texts,
-            "task_description": "qa",
-            "normalize": True
-        },
-        timeout=60
-    )
+    def post():
+        r = requests.post(
+            EMBED_URL,
+            json={
+                "texts": texts,
+                "task_description": "qa",
+                "normalize": True
+            },
+            timeout=60
+        )
+        r.raise_for_status()
+        return r.json()["embeddings"]
 
-    return r.json()["embeddings"]
+    return embed_limiter.call(post)
 
 
 # =========================
 # 建立向量庫
 # =========================
 
-def build_index(chunks):
+def prepare_chunks():
 
-    print("📦 建立向量庫...")
+    print("📂 載入文件中...\n")
 
-    client_q = QdrantClient(":memory:")
+    docs = load_documents()
 
-    test_vec = embed(["test"])[0]
-    dim = len(test_vec)
+    print("\n✂️ 切塊中...")
 
-    client_q.create_collection(
-        collection_name="docs",
-        vectors_config=VectorParams(
-            size=dim,
-            distance=Distance.COSINE
-        )
-    )
+    all_chunks = []
 
-    vectors = embed([c["text"] for c in chunks])
+    for name, text in docs.items():
+        all_chunks += split_text(text, name)
 
-    points = [
-        PointStruct(
-            id=i,
-            vector=v,
-            payload={
-                "text": chunks[i]["text"],
-                "source": chunks[i]["source"]
-            }
-        )
-        for i, v in enumerate(vectors)
-    ]
+    print(f"   → 共 {len(all_chunks)} 個 chunks\n")
+
+    return all_chunks
+
+
+def build_index():
 
-    client_q.upsert("docs", points)
+    print("📦 建立向量庫...")
+
+    # 文件內容、切塊與 embedding 設定都沒變 → 直接開啟上次的索引，
+    # 不重新讀文件、不重新 embed
+    config = {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embed_url": EMBED_URL,
+        "idp": idp.IDP_OPTIONS,
+    }
+
+    client_q = open_local_index(
+        INDEX_NAME,
+        "docs",
+        corpus_hashes(BASE_DIR, DOC_FILES),
+        prepare_chunks,
+        lambda texts: np.asarray(embed(texts), dtype=np.float32),
+        config=config
+    )
 
     print("✅ 向量庫建立完成")
 
@@ -223,7 +180,8 @@ def generate_answer(query, contexts):
         }
     ]
 
-    resp = client.chat.completions.create(
+    resp = llm_limiter.call(
+        client.chat.completions.create,
         model=LLM_MODEL,
         messages=messages,
         temperature=0
@@ -238,20 +196,7 @@ def generate_answer(query, contexts):
 
 def main():
 
-    print("📂 載入文件中...\n")
-
-    docs = load_documents()
-
-    print("\n✂️ 切塊中...")
-
-    all_chunks = []
-
-    for name, text in docs.items():
-        all_chunks += split_text(text, name)
-
-    print(f"   → 共 {len(all_chunks)} 個 chunks\n")
-
-    qdrant_client = build_index(all_chunks)
+    qdrant_client = build_index()
 
     print("\n🚀 文件問答系統已啟動\n")
 
@@ -260,6 +205,7 @@ def main():
         query = input("請輸入問題（輸入 exit 離開）：")
 
         if query.lower() == "exit":
+            print_stats()
             break
 
         if not query.strip():
@@ -0,0 +1,9 @@
+"""
+rag_common：CW / HW 各腳本共用的 RAG 工具
+
+各腳本以自己的目錄為工作目錄執行，使用前先把專案根目錄加入 sys.path：
+
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+"""
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# =========================
+# 基本設定
+# =========================
+LIMITS = {"llm": 8, "local": 1}   # 每個後端同時進行的呼叫數；沒列出的後端不限制
+MAX_BATCH = 32                    # batch_fn 每次最多合併幾題
+MAX_WAIT = 0.05                   # batch_fn 湊批最多等幾秒
+PROGRESS_EVERY = 10
+
+
+class Stage:
+    """
+    批次流程的一個階段，結果存進每題的 ctx[name]
+
+    - fn(ctx) -> 值：逐題呼叫（同步函式，在 thread 裡執行）
+    - batch_fn([ctx]) -> [值]：把同時在等這個階段的題目合成一批呼叫（例如檢索一次 embed 多個查詢）
+    - backend：共用同一個並行上限的後端名稱（見 LIMITS），例如 "llm" / "local"
+    """
+
+    def __init__(self, name, fn=None, batch_fn=None, backend=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        if (fn is None) == (batch_fn is None):
+            raise ValueError("Stage 需要 fn 或 batch_fn 其中之一")
+        self.name = name
+        self.fn = fn
+        self.batch_fn = batch_fn
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+
+class _Batcher:
+    """把同時到達的 ctx 湊成一批交給 batch_fn，再把結果分回各題"""
+
+    def __init__(self, stage, call):
+        self.stage = stage
+        self.call = call
+        self.pending = []
+        self.timer = None
+        self.tasks = set()
+
+    async def __call__(self, ctx):
+        fut = asyncio.get_running_loop().create_future()
+        self.pending.append((ctx, fut))
+        if len(self.pending) >= self.stage.max_batch:
+            self._flush()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.stage.max_wait, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch):
+        try:
+            values = list(await self.call(self.stage.batch_fn, [c for c, _ in batch]))
+            if len(values) != len(batch):
+                # zip 會默默截斷，沒分到結果的題目會永遠等下去
+                raise ValueError(
+                    f"Stage {self.stage.name!r} 的 batch_fn 收到 {len(batch)} 題，卻回傳 {len(values)} 個結果"
+                )
+            for (_, fut), v in zip(batch, values):
+                fut.set_result(v)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+
+
+async def run_stages_async(items, stages, limits=None, max_workers=None, progress=True):
+    """
+    每題依序經過 stages，不同題目的不同階段同時進行（rewrite → retrieve → answer 流水線）
+
+    - items：每題一個 dict，會複製成 ctx，各階段結果依 Stage.name 加進去
+    - 每個後端以 semaphore 限制同時呼叫數，避免把 LLM / embedding 服務打爆
+    - 回傳的 ctx list 與 items 順序相同（q_id 順序不變），任一題出錯就整批中止並拋出例外
+    """
+    limits = LIMITS if limits is None else limits
+    sems = {b: asyncio.Semaphore(n) for b, n in limits.items()}
+    pool = ThreadPoolExecutor(max_workers=max_workers or max(sum(limits.values()), 1))
+    loop = asyncio.get_running_loop()
+
+    def make_call(stage):
+        sem = sems.get(stage.backend)
+
+        async def call(fn, arg):
+            if sem is None:
+                return await loop.run_in_executor(pool, fn, arg)
+            async with sem:
+                return await loop.run_in_executor(pool, fn, arg)
+        return call
+
+    runners = {}
+    for st in stages:
+        call = make_call(st)
+        runners[st.name] = _Batcher(st, call) if st.batch_fn else (lambda c, st=st, call=call: call(st.fn, c))
+
+    items = [dict(it) for it in items]
+    done = 0
+    t0 = time.perf_counter()
+
+    async def run_one(ctx):
+        nonlocal done
+        for st in stages:
+            ctx[st.name] = await runners[st.name](ctx)
+        done += 1
+        if progress and (done % PROGRESS_EVERY == 0 or done == len(items)):
+            print(f"  ⏱️ {done}/{len(items)} 題完成（{time.perf_counter() - t0:.1f}s）")
+        return ctx
+
+    try:
+        return await asyncio.gather(*(run_one(c) for c in items))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_stages(items, stages, limits=None, max_workers=None, progress=True):
+    """run_stages_async 的同步版本（給一般 script 的 main 呼叫）"""
+    return asyncio.run(run_stages_async(items, stages, limits, max_workers, progress))
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from qdrant_client import models
+
+from rag_common.ingest import batched
+
+# =========================
+# 基本設定
+# =========================
+QUERY_BATCH_SIZE = 256    # 每次 query_batch_points 帶幾個查詢（4096 維約 20 MB，低於 Qdrant 預設 32 MB 上限）
+
+
+def dense_requests(vectors, limit, using=None, with_payload=True, params=None):
+    """把查詢向量矩陣 (n, dim) 轉成 QueryRequest list（params：SearchParams，如量化 rescore）"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return [
+        models.QueryRequest(
+            query=v.tolist(),
+            using=using,
+            limit=limit,
+            with_payload=with_payload,
+            params=params
+        )
+        for v in vectors
+    ]
+
+
+def batch_query(client, collection, requests, batch_size=QUERY_BATCH_SIZE):
+    """
+    以 query_batch_points 分批查詢，依 requests 順序逐筆 yield [ScoredPoint]
+
+    下一批會在呼叫端處理目前這批結果時就先送出，
+    1000 個問題只需要 ceil(1000 / batch_size) 次往返。
+    """
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = None
+        for batch in batched(requests, batch_size):
+            fut = pool.submit(
+                client.query_batch_points, collection_name=collection, requests=batch
+            )
+            if pending is not None:
+                for res in pending.result():
+                    yield res.points
+            pending = fut
+
+        if pending is not None:
+            for res in pending.result():
+                yield res.points
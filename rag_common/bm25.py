@@ -0,0 +1,175 @@
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+# =========================
+# 基本設定
+# =========================
+K1 = 1.5          # 與 rank_bm25.BM25Okapi 預設相同
+B = 0.75
+
+_TOKEN_RE = re.compile(
+    r"[a-z0-9]+(?:[._-][a-z0-9]+)*"                  # 英數字詞（含 v1.2、n4a-standard）
+    r"|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+"      # 連續的中日韓漢字
+)
+
+
+# =========================
+# 斷詞（可替換）
+# =========================
+def cjk_bigrams(text):
+    """
+    英數字以單字為 token，漢字連續段切成字元 bigram
+
+    「台中市氣溫」→ 台中、中市、市氣、氣溫；只有一個字的段落保留單字
+    """
+    tokens = []
+    for m in _TOKEN_RE.finditer(text.lower()):
+        run = m.group()
+        if run[0].isascii():
+            tokens.append(run)
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def jieba_tokenize(text):
+    """以 jieba 字典斷詞（需另外 pip install jieba），去掉空白與標點"""
+    try:
+        import jieba
+    except ImportError as e:
+        raise ImportError("jieba_tokenize 需要先 pip install jieba") from e
+    return [t for t in jieba.lcut(text.lower()) if _TOKEN_RE.fullmatch(t)]
+
+
+# =========================
+# 倒排索引
+# =========================
+class BM25Index:
+    """
+    倒排索引版 BM25
+
+    - 每個詞一條 postings：(doc id 陣列, 該詞在各文件的 BM25 分數)，分數在建索引時就算好
+    - get_scores(query)：與 BM25Okapi.get_scores 相同用法，但只累加查詢詞的 postings
+    - top_k(query, k)：MaxScore 提前結束，常見詞（分數上限低）的長 postings 不整條掃描
+    - score_docs(query, ids)：只算指定文件的分數（融合時補齊其他來源找到的候選）
+
+    idf 用 log(1 + (N - df + 0.5) / (df + 0.5))（恆為正），MaxScore 的上限才會成立；
+    rank_bm25 對負 idf 另外以 epsilon 補正，兩者在常見詞上的分數會略有差異。
+    """
+
+    def __init__(self, docs, tokenizer=cjk_bigrams, k1=K1, b=B):
+        self.tokenizer = tokenizer
+        self.k1 = k1
+        self.b = b
+
+        postings = {}
+        doc_len = np.empty(len(docs), dtype=np.float32)
+        for i, doc in enumerate(docs):
+            tf = Counter(tokenizer(doc))
+            doc_len[i] = sum(tf.values())
+            for term, n in tf.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(i)
+                postings[term][1].append(n)
+
+        self.n_docs = len(docs)
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.mean()) if len(docs) else 0.0
+
+        norm = k1 * (1 - b + b * doc_len / (self.avgdl or 1.0))
+        self.postings = {}
+        self.max_score = {}
+        for term, (ids, tfs) in postings.items():
+            ids = np.asarray(ids, dtype=np.int32)
+            tfs = np.asarray(tfs, dtype=np.float32)
+            w = self.idf(len(ids)) * tfs * (k1 + 1) / (tfs + norm[ids])
+            self.postings[term] = (ids, w.astype(np.float32))
+            self.max_score[term] = float(w.max())
+
+    def idf(self, df):
+        return math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def _query_terms(self, query):
+        """查詢詞與出現次數（重複的詞分數要乘上次數，與 BM25Okapi 相同），只留索引內有的詞"""
+        qtf = Counter(self.tokenizer(query))
+        return [(t, n) for t, n in qtf.items() if t in self.postings]
+
+    def get_scores(self, query):
+        """回傳長度為文件數的分數陣列（只走查詢詞的 postings）"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term, n in self._query_terms(query):
+            ids, w = self.postings[term]
+            scores[ids] += n * w
+        return scores
+
+    def score_docs(self, query, doc_ids):
+        """只算指定文件的分數（每個查詢詞在 postings 上二分搜尋），給候選融合用"""
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        for term, n in self._query_terms(query):
+            ids, w = self.postings[term]
+            pos = np.searchsorted(ids, doc_ids)
+            pos[pos == len(ids)] = 0
+            hit = ids[pos] == doc_ids
+            scores[hit] += n * w[pos[hit]]
+        return scores
+
+    def top_k(self, query, k=5):
+        """
+        MaxScore：依分數上限由高到低處理查詢詞
+
+        目前候選的第 k 高分（下界）θ ≥ 剩下詞的分數上限總和時，
+        沒出現在候選裡的文件不可能擠進前 k 名，之後的詞只對候選查分數，
+        不再把整條 postings 併進來；分數上限不夠的候選也一併剔除。
+
+        回傳：[(doc id, score)]，分數由高到低（同分時 doc id 小的在前）
+        """
+        terms = sorted(
+            self._query_terms(query),
+            key=lambda tn: tn[1] * self.max_score[tn[0]],
+            reverse=True
+        )
+        if not terms or k <= 0:
+            return []
+
+        bounds = [n * self.max_score[t] for t, n in terms]
+        rest = sum(bounds)
+
+        cand = np.empty(0, dtype=np.int32)
+        cand_scores = np.empty(0, dtype=np.float32)
+        theta = 0.0
+
+        for (term, n), bound in zip(terms, bounds):
+            ids, w = self.postings[term]
+
+            if len(cand) >= k and theta >= rest:
+                # 只查候選文件在這條 postings 裡的分數
+                pos = np.searchsorted(ids, cand)
+                pos[pos == len(ids)] = 0
+                hit = ids[pos] == cand
+                cand_scores[hit] += n * w[pos[hit]]
+            else:
+                # 整條 postings 併進候選
+                all_ids = np.concatenate([cand, ids])
+                all_w = np.concatenate([cand_scores, n * w])
+                cand, inv = np.unique(all_ids, return_inverse=True)
+                cand_scores = np.bincount(inv, weights=all_w).astype(np.float32)
+
+            rest -= bound
+            if len(cand) >= k:
+                theta = float(np.partition(cand_scores, len(cand) - k)[len(cand) - k])
+                keep = cand_scores + rest >= theta
+                if not keep.all():
+                    cand, cand_scores = cand[keep], cand_scores[keep]
+
+        k = min(k, len(cand))
+        if k == 0:
+            return []
+        top = np.argpartition(-cand_scores, k - 1)[:k]
+        top = top[np.lexsort((cand[top], -cand_scores[top]))]
+        return [(int(cand[i]), float(cand_scores[i])) for i in top]
@@ -0,0 +1,195 @@
+import hashlib
+import mmap
+import os
+from pathlib import Path
+
+import numpy as np
+
+from rag_common.file_lock import file_lock
+
+# ═══════════════════════════════
+# 基本設定
+# ═══════════════════════════════
+CHUNK_DIR = Path(
+    os.environ.get("RAG_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache")
+) / "chunks"
+
+BLOB = "texts.bin"          # 所有文件的 UTF-8 原文，只往後附加
+OFFSETS = "offsets.i64"     # 每篇文件在 BLOB 的結束位置（int64），第 i 篇 = [ends[i-1], ends[i])
+HASHES = "hashes.bin"       # 每篇文件內容的 sha256（32 bytes），同一份原文只存一次
+LOCK = "lock"               # 寫入時的跨 process 鎖
+DEAD = b"\x00" * 32         # 中斷寫入留下的 blob 尾巴記成這個 hash，不會被任何 point 引用
+
+
+def byte_offsets(text, char_pos):
+    """字元位移 → UTF-8 位元組位移（一次算出整篇的累計位元組數）"""
+    cps = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    width = 1 + (cps >= 0x80) + (cps >= 0x800) + (cps >= 0x10000)
+    cum = np.zeros(len(cps) + 1, dtype=np.int64)
+    np.cumsum(width, out=cum[1:])
+    return cum[np.asarray(char_pos, dtype=np.int64)]
+
+
+def without_text(chunk):
+    """
+    upsert 用的 payload：原文在 ChunkStore，point 只帶 doc_id / start / end 等欄位
+
+    沒有 doc_id 的 chunk（內容不是原文的連續片段，無法用位移表示）保留 "text"
+    """
+    if "doc_id" not in chunk:
+        return chunk
+    return {k: v for k, v in chunk.items() if k != "text"}
+
+
+def merge_hits(payloads):
+    """
+    組 prompt 前合併命中：同一篇文件（doc_id）中重疊或相鄰的 chunk 併成一段
+
+    滑動視窗的相鄰 chunk 常一起進 top-k，直接 join 會把重疊的字送給 LLM 兩次。
+    回傳 [{"doc_id", "start", "end"}]，依每段裡名次最前的命中排序；
+    沒有 doc_id 的 payload（直接存 "text"）原樣保留，完全相同的只留一份。
+    """
+    groups = {}          # doc_id → [(start, end, rank)]
+    plain = []           # (rank, payload)
+    seen_text = set()
+    for rank, p in enumerate(payloads):
+        if "doc_id" in p:
+            groups.setdefault(p["doc_id"], []).append((p["start"], p["end"], rank))
+        elif p["text"] not in seen_text:
+            seen_text.add(p["text"])
+            plain.append((rank, p))
+
+    merged = []
+    for doc_id, hits in groups.items():
+        hits.sort()
+        start, end, best = hits[0]
+        for s, e, r in hits[1:]:
+            if s <= end:
+                end = max(end, e)
+                best = min(best, r)
+            else:
+                merged.append((best, {"doc_id": doc_id, "start": start, "end": end}))
+                start, end, best = s, e, r
+        merged.append((best, {"doc_id": doc_id, "start": start, "end": end}))
+
+    return [p for _, p in sorted(merged + plain, key=lambda x: x[0])]
+
+
+class ChunkStore:
+    """
+    chunk 原文存放區：一個只附加的 UTF-8 blob + 文件結束位移陣列，讀取時 mmap
+
+    - add_spans(spans)：把 Spans 的原文存進來，回傳每個 chunk 的 {"doc_id", "start", "end"}
+      （start / end 為文件內的位元組位移），放進 point payload 取代整段 "text"
+    - text(payload)：依 payload 從 mmap 切出原文；舊 collection 的 payload 仍有 "text" 時直接回傳
+    - view(doc_id, start, end)：memoryview，不複製
+    - contexts(points)：同一篇文件重疊 / 相鄰的命中先合併再取原文，組 prompt 用
+
+    只附加、同一份原文依 sha256 只存一次，所以舊 point 的 doc_id 永遠有效，增量索引沿用的 point 也不必改寫。
+    寫入時拿檔案鎖並重新讀取位移，多個 process / 物件同時寫入也不會蓋掉彼此附加的原文；
+    寫入順序為 blob → hash → offset，中途中斷時多出來的 blob 尾巴不截斷，下次寫入時記成一筆空位。
+    """
+
+    def __init__(self, name, store_dir=CHUNK_DIR):
+        self.path = Path(store_dir) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        for fn in (BLOB, OFFSETS, HASHES):
+            (self.path / fn).touch()
+        self._mm = None
+        self._view = None
+        self._load()
+
+    def _load(self):
+        ends = np.fromfile(self.path / OFFSETS, dtype=np.int64)
+        raw = (self.path / HASHES).read_bytes()
+        n = min(len(ends), len(raw) // 32)
+        self._ends = ends[:n]
+        self._hashes = {raw[i * 32:(i + 1) * 32]: i for i in range(n) if raw[i * 32:(i + 1) * 32] != DEAD}
+
+        self._close_map()
+        size = int(self._ends[-1]) if n else 0
+        if size:
+            with open(self.path / BLOB, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mm)
+
+    def _close_map(self):
+        if self._view is not None:
+            try:
+                self._view.release()
+                self._mm.close()
+            except BufferError:
+                pass              # 呼叫端還拿著 view() 的結果，等它們釋放後由 GC 關閉
+        self._mm = self._view = None
+
+    def __len__(self):
+        return len(self._ends)
+
+    # ---------- 寫入 ----------
+
+    def add(self, text):
+        """存入一篇原文，回傳 doc_id；內容相同的文件回傳原本的 doc_id"""
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).digest()
+        if digest in self._hashes:
+            return self._hashes[digest]
+
+        with file_lock(self.path / LOCK):
+            self._load()              # 其他 process / 物件可能已經附加了文件
+            if digest in self._hashes:
+                return self._hashes[digest]
+
+            n = len(self._ends)
+            end = int(self._ends[-1]) if n else 0
+            size = os.path.getsize(self.path / BLOB)
+            if size > end:
+                self._write_entry(n, DEAD, size)
+                n += 1
+
+            with open(self.path / BLOB, "ab") as f:
+                f.write(data)
+            self._write_entry(n, digest, size + len(data))
+            self._load()
+        return n
+
+    def _write_entry(self, i, digest, end):
+        """第 i 筆的 hash 與結束位移（覆寫上次中斷時只寫了一半的索引尾巴）"""
+        with open(self.path / HASHES, "r+b") as f:
+            f.seek(i * 32)
+            f.write(digest)
+        with open(self.path / OFFSETS, "r+b") as f:
+            f.seek(i * 8)
+            f.write(np.int64(end).tobytes())
+
+    def add_spans(self, spans):
+        """存入 Spans 的原文，回傳每個 chunk 的 payload 欄位 [{"doc_id", "start", "end"}]"""
+        doc_id = self.add(spans.text)
+        starts = byte_offsets(spans.text, spans.starts).tolist()
+        ends = byte_offsets(spans.text, spans.ends).tolist()
+        return [{"doc_id": doc_id, "start": s, "end": e} for s, e in zip(starts, ends)]
+
+    # ---------- 讀取 ----------
+
+    def view(self, doc_id, start, end):
+        if doc_id >= len(self._ends):
+            self._load()          # 其他 process 之後又附加了文件
+        base = int(self._ends[doc_id - 1]) if doc_id else 0
+        if self._view is None:
+            return memoryview(b"")
+        return self._view[base + start:base + end]
+
+    def text(self, payload):
+        if "text" in payload:
+            return payload["text"]
+        return str(self.view(payload["doc_id"], payload["start"], payload["end"]), "utf-8")
+
+    def texts(self, points):
+        """[ScoredPoint] → [原文]"""
+        return [self.text(p.payload) for p in points]
+
+    def contexts(self, points):
+        """[ScoredPoint] → 合併重疊 / 相鄰命中後的原文段落（見 merge_hits），給 prompt 用"""
+        return [self.text(p) for p in merge_hits([pt.payload for pt in points])]
+
+    def close(self):
+        self._close_map()
@@ -0,0 +1,182 @@
+import re
+
+import numpy as np
+
+
+class Spans:
+    """
+    切塊結果：原文 + (start, end) 位移陣列
+
+    只存位移，取用時才切出字串（lazy），
+    可以像 list 一樣 len() / 索引 / 迭代。
+    """
+
+    def __init__(self, text, starts, ends):
+        self.text = text
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i):
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def __iter__(self):
+        text = self.text
+        for s, e in zip(self.starts.tolist(), self.ends.tolist()):
+            yield text[s:e]
+
+    def spans(self):
+        return list(zip(self.starts.tolist(), self.ends.tolist()))
+
+    def tolist(self):
+        return list(self)
+
+
+def _empty(text):
+    return Spans(text, np.empty(0, np.int64), np.empty(0, np.int64))
+
+
+def _strip(text, starts, ends):
+    """去掉每段頭尾空白；只動到邊界是空白的那幾段"""
+    starts = starts.tolist()
+    ends = ends.tolist()
+    for i, (s, e) in enumerate(zip(starts, ends)):
+        if s < e and text[s].isspace():
+            while s < e and text[s].isspace():
+                s += 1
+            starts[i] = s
+        if s < e and text[e - 1].isspace():
+            while e > s and text[e - 1].isspace():
+                e -= 1
+            ends[i] = e
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+
+def window_spans(text, chunk_size=500, overlap=0, min_len=0):
+    """
+    迴圈版 text[i:i + chunk_size] for i in range(0, len(text), step) 的向量化版本
+
+    - overlap=0 為固定大小，>0 為滑動視窗
+    - 只保留長度 > min_len 的片段（day5 用 150、CW03 / CW04 用 100）
+    """
+    n = len(text)
+    step = chunk_size - overlap
+    starts = np.arange(0, n, step, dtype=np.int64)
+    ends = np.minimum(starts + chunk_size, n)
+
+    if min_len:
+        keep = (ends - starts) > min_len
+        starts, ends = starts[keep], ends[keep]
+    return Spans(text, starts, ends)
+
+
+def splitter_spans(text, chunk_size=500, overlap=0):
+    """
+    與 CharacterTextSplitter(separator="", length_function=len) 結果相同的切法
+
+    每塊 chunk_size 字、每次前進 chunk_size - overlap 字，
+    最後一塊包含剩下的全部文字；每塊去頭尾空白，空塊略過。
+    """
+    n = len(text)
+    if n == 0:
+        return _empty(text)
+
+    step = chunk_size - overlap
+    full = -(-(n - chunk_size) // step) if n > chunk_size else 0
+    starts = np.arange(full + 1, dtype=np.int64) * step
+    ends = np.minimum(starts + chunk_size, n)
+
+    starts, ends = _strip(text, starts, ends)
+    keep = ends > starts
+    return Spans(text, starts[keep], ends[keep])
+
+
+# =========================
+# 句子邊界切塊
+# =========================
+SENTENCE_SEPS = "。！？；"
+
+
+def _sentences(text, seps):
+    """產生 (start, end, sentence)，sentence = text[start:end] + 補上的分隔符號"""
+    rank = {c: k for k, c in enumerate(seps)}
+    suffixes = [seps[k:] for k in range(len(seps))]
+    parts = re.split("([" + re.escape(seps) + "])", text)
+
+    pos = 0
+    prev_rank = -1
+    last = len(parts) - 1
+    for i in range(0, len(parts), 2):
+        seg = parts[i]
+        next_rank = rank[parts[i + 1]] if i < last else -1
+        end = pos + len(seg)
+
+        if seg and not seg.isspace():
+            yield pos, end, seg + suffixes[max(next_rank, 0)]
+        else:
+            # 舊寫法在「第一個讓這段獨立出來的分隔符號」那一輪判斷是否為空白；
+            # 那一輪若它是最後一段，前幾輪補上的符號會讓它保留下來
+            k = max(prev_rank, next_rank, 0)
+            if k != 0 and next_rank != k:
+                yield pos, end, seg + suffixes[max(next_rank, 0)]
+
+        pos = end + 1
+        prev_rank = next_rank
+
+
+def sentence_spans(text, seps=SENTENCE_SEPS):
+    """
+    一次掃描找出句子，結果與依序對每個分隔符號 split 再補回符號的舊寫法相同
+
+    回傳 [(start, end, suffix)]，句子 = text[start:end] + suffix
+    - suffix 為 seps[r:]，r 是句尾分隔符號在 seps 中的順位（文末沒有分隔符號則為全部）
+    - 空白句只在舊寫法會被濾掉時略過
+    """
+    return [(s, e, sent[e - s:]) for s, e, sent in _sentences(text, seps)]
+
+
+def sentence_chunks(text, chunk_size=500, overlap=50, min_len=150, seps=SENTENCE_SEPS):
+    """
+    依句子邊界累積成 chunk，超過 chunk_size 就輸出並保留最後 overlap 字
+
+    產生 (start, end, chunk)：start / end 為 chunk 涵蓋的原文位移（含句尾符號），
+    chunk 與舊的 buf += s 寫法逐字相同，但每個 chunk 只 join 一次。
+    """
+    n = len(text)
+    parts, part_starts = [], []
+    size = 0
+    end = 0
+
+    for s, e, sent in _sentences(text, seps):
+        if size + len(sent) <= chunk_size:
+            parts.append(sent)
+            part_starts.append(s)
+            size += len(sent)
+        else:
+            buf = "".join(parts)
+            if size > min_len:
+                yield part_starts[0], end, buf
+
+            tail = buf[-overlap:]
+            if tail:
+                tail_start = _tail_start(parts, part_starts, len(tail))
+                parts, part_starts = [tail, sent], [tail_start, s]
+            else:
+                parts, part_starts = [sent], [s]
+            size = len(tail) + len(sent)
+        end = min(e + 1, n)
+
+    if size > min_len:
+        yield part_starts[0], end, "".join(parts)
+
+
+def _tail_start(parts, part_starts, tail_len):
+    """找出最後 tail_len 字從哪一段句子開始，回傳該句原文起點"""
+    remain = tail_len
+    for p, s in zip(reversed(parts), reversed(part_starts)):
+        remain -= len(p)
+        if remain <= 0:
+            return s
+    return part_starts[0] if part_starts else 0
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from rag_common.file_lock import file_lock
+
+# =========================
+# 基本設定
+# =========================
+CACHE_DIR = Path(
+    os.environ.get("RAG_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache")
+) / "embeddings"
+
+MAX_ENTRIES = 200_000     # 超過就淘汰最久沒用到的向量（LRU）
+INIT_CAPACITY = 1024      # memmap 初始列數，不夠時倍增
+
+INDEX_DTYPE = np.dtype([("key", "S32"), ("slot", "<i8")])
+
+_instances = {}           # 快取目錄 → EmbeddingCache，同一個目錄在 process 內只有一個物件
+_instances_lock = threading.Lock()
+
+
+def make_key(text, model, normalize, variant=""):
+    """
+    (sha256(text), model, normalize, variant) → 32 bytes key
+
+    variant 放其他會改變向量的設定（例如 EmbeddingClient 的 extra_payload）；空字串時 key 與舊版相同
+    """
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\x00" + (b"1" if normalize else b"0") + b"\x00")
+    if variant:
+        h.update(variant.encode("utf-8") + b"\x00")
+    h.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return h.digest()
+
+
+class EmbeddingCache:
+    """
+    以內容雜湊為 key 的持久化 embedding 快取
+
+    - 向量存在 memory-mapped float32 矩陣（vectors.f32）
+    - key → 列號 存在精簡的 index.npy（依 LRU 順序）
+    - 超過 max_entries 時淘汰最久沒用到的一筆並重用它的列
+
+    同一個目錄在 process 內共用一個物件（EmbeddingCache(...) 會回傳已開啟的那個，
+    這時再指定不同的 max_entries 會直接報錯，沒指定則沿用已開啟的設定）；
+    跨 process 則以目錄裡的 lock 檔互斥，查詢 / 配置列號前先重新讀取其他 process 寫入的 index，
+    不會有兩邊拿到同一列、互相覆寫向量的情況
+    """
+
+    def __new__(cls, model, cache_dir=CACHE_DIR, max_entries=None):
+        path = (Path(cache_dir) / re.sub(r"[^\w.-]+", "_", model)).resolve()
+        with _instances_lock:
+            if path not in _instances:
+                _instances[path] = super().__new__(cls)
+            return _instances[path]
+
+    def __init__(self, model, cache_dir=CACHE_DIR, max_entries=None):
+        if getattr(self, "_ready", False):
+            if max_entries is not None and max_entries != self.max_entries:
+                raise ValueError(
+                    f"{self.dir} 的 EmbeddingCache 已用 max_entries={self.max_entries} 開啟，"
+                    f"不能再以 max_entries={max_entries} 開啟"
+                )
+            return
+        self.model = model
+        self.max_entries = MAX_ENTRIES if max_entries is None else max_entries
+        self.dir = Path(cache_dir) / re.sub(r"[^\w.-]+", "_", model)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+        self._vec_path = self.dir / "vectors.f32"
+        self._index_path = self.dir / "index.npy"
+        self._meta_path = self.dir / "dim.txt"
+        self._lock_path = self.dir / "lock"
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()      # key -> slot，最舊的在前面
+        self._free = []
+        self._vectors = None
+        self._stamp = None             # 上次讀 / 寫 index.npy 時的檔案狀態
+        self.dim = None
+
+        self.hits = 0
+        self.misses = 0
+
+        with file_lock(self._lock_path):
+            self._sync()
+        self._ready = True
+
+    # ---------- 讀寫檔案（呼叫端需持有 file_lock） ----------
+
+    def _index_stamp(self):
+        try:
+            st = os.stat(self._index_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _sync(self):
+        """把其他 process 寫入的 dim / 向量檔大小 / index 讀進來（index 沒變就不重讀）"""
+        if not self._meta_path.exists():
+            return
+        if self.dim is None:
+            self.dim = int(self._meta_path.read_text())
+        rows = os.path.getsize(self._vec_path) // (self.dim * 4)
+        if self._vectors is None or len(self._vectors) != rows:
+            self._vectors = None
+            self._open_vectors()
+
+        stamp = self._index_stamp()
+        if stamp != self._stamp:
+            self._lru = OrderedDict()
+            if stamp is not None:
+                index = np.load(self._index_path)
+                # "S32" 讀回來會去掉結尾的 \x00，key 固定 32 bytes，補回來才對得上
+                self._lru = OrderedDict(
+                    (bytes(k).ljust(32, b"\x00"), int(s)) for k, s in zip(index["key"], index["slot"])
+                )
+            self._stamp = stamp
+        used = set(self._lru.values())
+        self._free = [s for s in range(len(self._vectors)) if s not in used]
+
+    def _open_vectors(self, capacity=None):
+        if capacity is not None:
+            with open(self._vec_path, "ab") as f:
+                f.truncate(capacity * self.dim * 4)
+        rows = os.path.getsize(self._vec_path) // (self.dim * 4)
+        self._vectors = np.memmap(
+            self._vec_path, dtype=np.float32, mode="r+", shape=(rows, self.dim)
+        )
+
+    def _init_storage(self, dim):
+        self.dim = dim
+        self._meta_path.write_text(str(dim))
+        self._vec_path.write_bytes(b"")
+        self._open_vectors(min(INIT_CAPACITY, self.max_entries))
+        self._free = list(range(len(self._vectors)))
+
+    def _grow(self):
+        old = len(self._vectors)
+        new = min(old * 2, self.max_entries)
+        self._vectors.flush()
+        self._vectors = None
+        self._open_vectors(new)
+        self._free.extend(range(old, new))
+
+    def _alloc_slot(self):
+        if not self._free and len(self._vectors) < self.max_entries:
+            self._grow()
+        if self._free:
+            return self._free.pop()
+        _, slot = self._lru.popitem(last=False)
+        return slot
+
+    def _save_index(self):
+        self._vectors.flush()
+        index = np.array(list(self._lru.items()), dtype=INDEX_DTYPE)
+        tmp = self._index_path.with_suffix(f".{os.getpid()}.tmp.npy")
+        np.save(tmp, index)
+        os.replace(tmp, self._index_path)
+        self._stamp = self._index_stamp()
+
+    def flush(self):
+        """把 LRU 順序寫回 index.npy"""
+        with self._lock, file_lock(self._lock_path):
+            if self._vectors is None:
+                return
+            self._sync()
+            self._save_index()
+
+    # ---------- 對外介面 ----------
+
+    def __len__(self):
+        return len(self._lru)
+
+    def get_or_compute(self, texts, compute_fn, normalize=True, variant=""):
+        """
+        先查快取，只把沒命中的文字交給 compute_fn 計算
+
+        compute_fn(list[str]) -> np.ndarray (n, dim)
+        variant：見 make_key，同一個 model 不同請求參數的向量分開存
+        回傳：np.ndarray (len(texts), dim)，float32
+        """
+        texts = list(texts)
+        keys = [make_key(t, self.model, normalize, variant) for t in texts]
+
+        found = {}
+        missing = {}
+        with self._lock, file_lock(self._lock_path):
+            self._sync()
+            for k, t in zip(keys, texts):
+                if k in found or k in missing:
+                    continue
+                if k in self._lru:
+                    self._lru.move_to_end(k)
+                    found[k] = np.array(self._vectors[self._lru[k]])
+                    self.hits += 1
+                else:
+                    missing[k] = t
+                    self.misses += 1
+
+        if missing:
+            computed = np.asarray(compute_fn(list(missing.values())), dtype=np.float32)
+
+            # 計算期間其他 process / thread 可能已經寫入：拿鎖後重讀 index 再配置列號，寫完立刻存檔
+            with self._lock, file_lock(self._lock_path):
+                self._sync()
+                if self._vectors is None:
+                    self._init_storage(computed.shape[1])
+                for k, v in zip(missing.keys(), computed):
+                    if k in self._lru:       # 同時 miss 的另一方已經存了，不再占用新的列
+                        found[k] = v
+                        continue
+                    slot = self._alloc_slot()
+                    self._vectors[slot] = v
+                    self._lru[k] = slot
+                    found[k] = v
+                self._save_index()
+
+        if not texts:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, k in enumerate(keys):
+            out[i] = found[k]
+        return out
+
+
+def cached_encode(model, texts, cache, normalize=False):
+    """SentenceTransformer.encode 的快取版本"""
+    return cache.get_or_compute(
+        texts,
+        lambda batch: model.encode(batch, normalize_embeddings=normalize),
+        normalize=normalize
+    )
@@ -0,0 +1,153 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from rag_common.embed_cache import EmbeddingCache
+from rag_common.rate_limit import get_limiter
+
+# =========================
+# 基本設定
+# =========================
+EMBED_API_URL = "https://ws-04.wade0426.me/embed"
+
+BATCH_SIZE = 32       # 每個 request 送幾段文字
+MAX_WORKERS = 4       # 同時在路上的 batch 數
+TIMEOUT = 60          # 單一 batch 的逾時秒數
+RATE = 20.0           # limiter 的起始每秒 batch 數；embedding 服務比 LLM 快，不用 LLM 的預設值
+
+
+def embed_limiter(url=EMBED_API_URL, max_workers=MAX_WORKERS):
+    """
+    embedding 服務共用的 limiter
+
+    起始速率 RATE、桶子容量 max_workers * 2：一開始就能讓所有 worker 同時送出，
+    之後依 429 / 逾時自動降速；直接呼叫 embedding API 的腳本也用這個，設定才一致
+    """
+    return get_limiter(url, rate=RATE, burst=max_workers * 2)
+
+
+class EmbeddingClient:
+    """
+    共用的 Embedding API client
+
+    - 輸入切成 micro-batch，避免單一 request 過大或逾時
+    - 重用 keep-alive 的 requests.Session（連線池）
+    - 以有上限的 ThreadPool 同時送出多個 batch
+    - 回傳連續的 float32 NumPy 矩陣 (len(texts), dim)
+    - 給定 cache（EmbeddingCache）時，只對沒命中的文字呼叫 API
+    - 每個 batch 經過同一個 url 共用的 AdaptiveRateLimiter：限速，429 / 5xx / 逾時退避重試
+    """
+
+    def __init__(
+        self,
+        url=EMBED_API_URL,
+        batch_size=BATCH_SIZE,
+        max_workers=MAX_WORKERS,
+        timeout=TIMEOUT,
+        extra_payload=None,
+        cache=None
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.extra_payload = dict(extra_payload or {})
+        self.cache = cache
+        # extra_payload 會改變 API 回傳的向量，要算進快取 key
+        self.cache_variant = json.dumps(self.extra_payload, sort_keys=True) if self.extra_payload else ""
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.limiter = embed_limiter(url, max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.dimension = None
+
+    def _post(self, texts, normalize):
+        payload = {"texts": texts, "normalize": normalize, **self.extra_payload}
+
+        def post():
+            r = self.session.post(self.url, json=payload, timeout=self.timeout)
+            r.raise_for_status()
+            return r.json()["embeddings"]
+
+        return np.asarray(self.limiter.call(post), dtype=np.float32)
+
+    def embed(self, texts, normalize=True):
+        """
+        回傳：
+            embeddings: np.ndarray，shape = (len(texts), dim)，float32
+        """
+        if self.cache is None:
+            return self.embed_uncached(texts, normalize)
+
+        out = self.cache.get_or_compute(
+            texts, lambda batch: self.embed_uncached(batch, normalize), normalize, self.cache_variant
+        )
+        self.dimension = out.shape[1] or self.dimension
+        return out
+
+    def embed_uncached(self, texts, normalize=True):
+        """不經過 cache 直接呼叫 API（給自己管理快取的呼叫端，例如 QueryEmbeddingCache）"""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+
+        batches = [
+            texts[i:i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+
+        if len(batches) == 1:
+            results = [self._post(batches[0], normalize)]
+        else:
+            # map 會依輸入順序回傳，不需要再排序
+            results = self._pool.map(lambda b: self._post(b, normalize), batches)
+
+        out = None
+        row = 0
+        for vecs in results:
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[row:row + len(vecs)] = vecs
+            row += len(vecs)
+
+        self.dimension = out.shape[1]
+        return out
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.session.close()
+
+
+# =========================
+# 預設共用 client
+# =========================
+_default_client = None
+_default_lock = threading.Lock()
+
+
+def get_client():
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = EmbeddingClient(cache=EmbeddingCache(EMBED_API_URL))
+        return _default_client
+
+
+def get_embeddings(texts, normalize=True):
+    """
+    與各腳本原本的 get_embeddings 介面相同
+
+    回傳：
+        embeddings: np.ndarray (float32)
+        vector_size: int
+    """
+    embeddings = get_client().embed(texts, normalize=normalize)
+    return embeddings, embeddings.shape[1]
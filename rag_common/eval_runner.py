@@ -0,0 +1,174 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from rag_common.judge_cache import CASE_FIELDS, JudgeCache
+
+# =========================
+# 基本設定
+# =========================
+MAX_CONCURRENCY = 16     # 同時評估的 (test case × metric) 工作數
+LOG_FIELDS = ["case_id", "case_hash", "metric", "score", "reason", "error"]
+
+
+def case_hash(test_case):
+    """LLMTestCase 內容的雜湊：回答或 context 變了，舊分數就不會被沿用"""
+    data = {f: getattr(test_case, f, None) for f in CASE_FIELDS}
+    return hashlib.sha256(
+        json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+def log_path(output_csv):
+    """逐筆寫入的進度檔：output.csv → output.jobs.csv"""
+    p = Path(output_csv)
+    return p.with_name(p.stem + ".jobs.csv")
+
+
+def load_done(path):
+    """讀進度檔，回傳 {(case_id, case_hash, metric): (score, reason)}；有 error 的不算完成，續跑時重做"""
+    done = {}
+    if not Path(path).exists():
+        return done
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            if not r["error"]:
+                done[(r["case_id"], r["case_hash"], r["metric"])] = (float(r["score"]), r["reason"])
+    return done
+
+
+async def evaluate_async(
+    cases,
+    metrics,
+    output_csv,
+    max_concurrency=MAX_CONCURRENCY,
+    time_budget=None,
+    resume=True,
+    judge_cache=True,
+    on_case_done=None
+):
+    """
+    (test case × metric) 工作同時評估，分數一完成就寫進進度檔，最後整理成每題一列的 CSV
+
+    - cases：[(case_id, LLMTestCase, 輸出欄位 dict)]，case_id 通常是 q_id，
+      輸出欄位（q_id / questions / answer 等）原樣寫進結果 CSV，後面接各 metric 分數
+    - metrics：{欄位名稱: 建立 metric 的函式}；metric 物件會記住上一次的分數，
+      所以每個工作各自 new 一個，不共用
+    - 同時最多 max_concurrency 個工作；judge 呼叫的速率與重試由 JudgeLLM 的 AdaptiveRateLimiter 控制
+    - time_budget（秒）：超過就不再開始新的工作，沒做完的留給下次續跑
+    - resume=True：進度檔中已成功、且 test case 內容相同的 (case_id, metric) 直接沿用，不再呼叫 judge
+    - judge_cache=True：跨輸出檔共用的 judge 結果快取（見 judge_cache.py），
+      同一個 metric + judge 看到的欄位沒變就直接沿用；可傳入 JudgeCache 物件，False 關閉
+    - on_case_done(case_id, scores)：某一題的所有 metric 都完成時呼叫（印結果用）
+
+    回傳：依 cases 順序的輸出列（輸出欄位 + 各 metric 分數，未完成為空字串）
+    """
+    log = log_path(output_csv)
+    if not resume and log.exists():
+        os.remove(log)
+    done = load_done(log)
+
+    sem = asyncio.Semaphore(max_concurrency)
+    deadline = time.monotonic() + time_budget if time_budget else None
+
+    new_log = not log.exists()
+    f = open(log, "a", newline="", encoding="utf-8")
+    writer = csv.DictWriter(f, fieldnames=LOG_FIELDS)
+    if new_log:
+        writer.writeheader()
+
+    cases = [(str(cid), tc, out, case_hash(tc)) for cid, tc, out in cases]
+    n_resumed = sum((cid, h, m) in done for cid, _, _, h in cases for m in metrics)
+
+    # judge 快取：每個 metric 建一個樣本算 key（名稱 / judge / 用到的欄位），命中的直接寫進進度檔
+    if judge_cache is True:
+        judge_cache = JudgeCache()
+    probes = {name: factory() for name, factory in metrics.items()} if judge_cache else {}
+    n_cached = 0
+    for cid, tc, _, h in cases:
+        for name, probe in probes.items():
+            if (cid, h, name) in done:
+                continue
+            hit = judge_cache.get(probe, tc)
+            if hit is not None:
+                done[(cid, h, name)] = hit
+                writer.writerow({"case_id": cid, "case_hash": h, "metric": name,
+                                 "score": hit[0], "reason": hit[1], "error": ""})
+                n_cached += 1
+    f.flush()
+
+    remaining = {cid: sum((cid, h, m) not in done for m in metrics) for cid, _, _, h in cases}
+    n_jobs = sum(remaining.values())
+    finished = 0
+    t0 = time.perf_counter()
+    print(f"🧮 評估工作 {n_jobs} 個（沿用進度檔 {n_resumed} 個、judge 快取 {n_cached} 個）")
+
+    def scores_of(cid, h):
+        return {m: done.get((cid, h, m), ("", ""))[0] for m in metrics}
+
+    async def job(cid, h, test_case, name):
+        nonlocal finished
+        async with sem:
+            if deadline and time.monotonic() > deadline:
+                return
+            row = {"case_id": cid, "case_hash": h, "metric": name, "score": "", "reason": "", "error": ""}
+            try:
+                metric = metrics[name]()
+                await metric.a_measure(test_case, _show_indicator=False)
+                if metric.score is None:
+                    raise ValueError("metric 沒有產生分數")
+                row["score"] = metric.score
+                row["reason"] = getattr(metric, "reason", "") or ""
+                done[(cid, h, name)] = (metric.score, row["reason"])
+                if judge_cache:
+                    judge_cache.put(metric, test_case, metric.score, row["reason"])
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+
+        writer.writerow(row)
+        f.flush()
+        finished += 1
+        if row["error"]:
+            print(f"  ❌ {cid} / {name}：{row['error']}")
+
+        remaining[cid] -= 1
+        if remaining[cid] == 0 and on_case_done:
+            on_case_done(cid, scores_of(cid, h))
+        if finished % 10 == 0 or finished == n_jobs:
+            print(f"  ⏱️ {finished}/{n_jobs}（{time.perf_counter() - t0:.1f}s）")
+
+    try:
+        await asyncio.gather(*(
+            job(cid, h, tc, name)
+            for cid, tc, _, h in cases
+            for name in metrics
+            if (cid, h, name) not in done
+        ))
+    finally:
+        f.close()
+
+    rows = []
+    for cid, _, out, h in cases:
+        row = dict(out)
+        for name, score in scores_of(cid, h).items():
+            row[name] = round(score, 3) if score != "" else ""
+        rows.append(row)
+
+    with open(output_csv, "w", newline="", encoding="utf-8") as fout:
+        w = csv.DictWriter(fout, fieldnames=list(rows[0].keys()) if rows else list(metrics))
+        w.writeheader()
+        w.writerows(rows)
+
+    left = sum((cid, h, m) not in done for cid, _, _, h in cases for m in metrics)
+    if left:
+        print(f"⏸️ 尚有 {left} 個工作未完成（時間到或出錯），再執行一次會從進度檔續跑")
+    return rows
+
+
+def evaluate(cases, metrics, output_csv, **kwargs):
+    """evaluate_async 的同步版本"""
+    return asyncio.run(evaluate_async(cases, metrics, output_csv, **kwargs))
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# ═══════════════════════════════
+# 基本設定
+# ═══════════════════════════════
+CACHE_DIR = Path(
+    os.environ.get("RAG_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache")
+) / "extract"
+
+READ_CHUNK = 1 << 20
+
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_CHUNK)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+
+def _hash_pdf_object(h, obj, seen):
+    """
+    把 pdfminer 的物件（含間接參照）依內容遞迴寫進雜湊
+
+    只看內容、不看物件編號，所以不同 PDF 裡相同的字型 / 圖片 / Form XObject 雜湊相同；
+    循環參照（例如 /Parent）只記一個標記
+    """
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+    from pdfminer.psparser import PSKeyword, PSLiteral
+
+    if isinstance(obj, PDFObjRef):
+        key = (id(obj.doc), obj.objid)
+        if key in seen:
+            h.update(b"<cycle>")
+            return
+        seen = seen | {key}
+        obj = obj.resolve()
+
+    if isinstance(obj, PDFStream):
+        h.update(b"<stream>")
+        _hash_pdf_object(h, {k: v for k, v in obj.attrs.items() if k != "Length"}, seen)
+        h.update(obj.get_rawdata() or b"")
+    elif isinstance(obj, dict):
+        h.update(b"<dict>")
+        for k in sorted(obj, key=str):
+            if k == "Parent":
+                continue
+            h.update(str(k).encode("utf-8") + b"\0")
+            _hash_pdf_object(h, obj[k], seen)
+        h.update(b"</dict>")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"<list>")
+        for v in obj:
+            _hash_pdf_object(h, v, seen)
+        h.update(b"</list>")
+    elif isinstance(obj, (PSLiteral, PSKeyword)):
+        h.update(b"/" + str(obj.name).encode("utf-8") + b"\0")
+    elif isinstance(obj, bytes):
+        h.update(b"<bytes>" + len(obj).to_bytes(8, "little") + obj)
+    else:
+        h.update(repr(obj).encode("utf-8") + b"\0")
+
+
+def page_fingerprint(page):
+    """
+    pdfplumber 頁面的內容雜湊：頁面大小 + 內容串流 + 整棵 /Resources
+
+    /Resources 展開到底（Form XObject 與它自己的 resources、字型、圖片），
+    內容串流相同（例如都是 /Fm0 Do）但畫的東西不同的頁面不會被當成同一頁。
+    只要這頁沒改，即使 PDF 其他頁有變動，雜湊也不變
+    """
+    from pdfminer.pdftypes import resolve1
+
+    h = hashlib.sha256()
+    h.update(f"{page.width}x{page.height}".encode())
+    for stream in page.page_obj.contents or []:
+        h.update(resolve1(stream).get_rawdata() or b"")
+    _hash_pdf_object(h, page.page_obj.resources, frozenset())
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """
+    文件提取結果的持久化快取
+
+    key = (內容雜湊, 提取器名稱, 提取選項)，每筆存成一個小 JSON 檔，
+    可以是整個檔案的雜湊（file_hash）或單一頁面的雜湊（page_fingerprint）。
+    多個 process 同時讀寫也安全（寫入用 os.replace）。
+    """
+
+    def __init__(self, extractor, options=None, cache_dir=CACHE_DIR):
+        self.extractor = extractor
+        self.options = json.dumps(options or {}, sort_keys=True, default=str)
+        self.dir = Path(cache_dir) / extractor
+
+    def _path(self, content_hash):
+        h = hashlib.sha256(
+            f"{self.extractor}\0{self.options}\0{content_hash}".encode("utf-8")
+        ).hexdigest()
+        return self.dir / h[:2] / f"{h}.json"
+
+    def get(self, content_hash):
+        p = self._path(content_hash)
+        if not p.exists():
+            return None
+        with open(p, encoding="utf-8") as f:
+            return json.load(f)["text"]
+
+    def put(self, content_hash, text):
+        p = self._path(content_hash)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"text": text}, f, ensure_ascii=False)
+        os.replace(tmp, p)
+
+    def get_or_extract(self, path, extract_fn):
+        """整個檔案層級：檔案內容沒變就直接回傳上次的結果"""
+        key = file_hash(path)
+        text = self.get(key)
+        if text is None:
+            text = extract_fn(path)
+            self.put(key, text)
+        return text
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from rag_common.batch_query import batch_query, dense_requests
+
+# =========================
+# 基本設定
+# =========================
+TOP_K = 3
+
+
+class FanoutSearcher:
+    """
+    同一個查詢向量同時查多個 collection
+
+    - 共用一個 QdrantClient（底下是 keep-alive 連線池），不再每次開新連線
+    - 每個 collection 一個 thread 同時送出，總耗時約等於最慢的那一個
+    - 結果依 collections 的順序回傳，並標上來自哪個 collection
+    - search_params：每次查詢都帶上的 SearchParams（例如量化 collection 的 rescore 設定）
+    """
+
+    def __init__(self, client, collections, max_workers=None, search_params=None):
+        self.client = client
+        self.collections = list(collections)
+        self.search_params = search_params
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(self.collections))
+
+    def _search_one(self, collection, query, limit, with_payload):
+        return self.client.query_points(
+            collection_name=collection,
+            query=query,
+            limit=limit,
+            with_payload=with_payload,
+            search_params=self.search_params
+        ).points
+
+    def search(self, query, limit=TOP_K, with_payload=True):
+        """
+        回傳：{collection: [ScoredPoint]}，key 的順序與 self.collections 相同
+        """
+        if isinstance(query, np.ndarray):
+            query = query.tolist()
+
+        futures = [
+            self._pool.submit(self._search_one, col, query, limit, with_payload)
+            for col in self.collections
+        ]
+        return {col: fut.result() for col, fut in zip(self.collections, futures)}
+
+    def search_batch(self, queries, limit=TOP_K, with_payload=True):
+        """
+        多個查詢向量 (n, dim) 一次查所有 collection
+
+        每個 collection 用 query_batch_points 分批查，各 collection 同時進行。
+        回傳：{collection: [[ScoredPoint], ...]}，內層依 queries 順序
+        """
+        requests = dense_requests(
+            queries, limit, with_payload=with_payload, params=self.search_params
+        )
+        futures = [
+            self._pool.submit(lambda col: list(batch_query(self.client, col, requests)), col)
+            for col in self.collections
+        ]
+        return {col: fut.result() for col, fut in zip(self.collections, futures)}
+
+    def close(self):
+        self._pool.shutdown()
+
+
+def merge_results(results):
+    """
+    把 {collection: [ScoredPoint]} 攤平成一個 list，每筆標上 collection 與名次
+
+    不同 collection 的距離尺度不同（cosine / dot / euclid），所以不跨 collection 排序，
+    依 collection 順序、各自名次排列。
+    """
+    merged = []
+    for col, points in results.items():
+        for rank, p in enumerate(points, 1):
+            merged.append({
+                "collection": col,
+                "rank": rank,
+                "score": p.score,
+                "id": p.id,
+                "payload": p.payload,
+            })
+    return merged
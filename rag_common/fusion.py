@@ -0,0 +1,117 @@
+import numpy as np
+
+# =========================
+# 基本設定
+# =========================
+RRF_K = 60          # RRF 的平滑常數
+RRF_DEPTH = 100     # RRF 每個來源只取前幾名參與融合
+
+
+# =========================
+# 分數正規化（每列一個查詢）
+# =========================
+def minmax(scores):
+    """每列縮放到 [0, 1]；整列同分時全部為 0"""
+    scores = np.asarray(scores, dtype=np.float32)
+    lo = scores.min(axis=1, keepdims=True)
+    span = scores.max(axis=1, keepdims=True) - lo
+    return np.divide(scores - lo, span, out=np.zeros_like(scores), where=span > 0)
+
+
+def zscore(scores):
+    """每列減平均、除以標準差；整列同分時全部為 0"""
+    scores = np.asarray(scores, dtype=np.float32)
+    mean = scores.mean(axis=1, keepdims=True)
+    std = scores.std(axis=1, keepdims=True)
+    return np.divide(scores - mean, std, out=np.zeros_like(scores), where=std > 0)
+
+
+NORMALIZERS = {"minmax": minmax, "zscore": zscore}
+
+
+def dense_scores(queries, doc_embeddings):
+    """向量都已正規化時 cosine = 內積，直接一次 matmul：(m, dim) @ (dim, n)"""
+    return np.asarray(queries, dtype=np.float32) @ doc_embeddings.T
+
+
+# =========================
+# top-k
+# =========================
+def top_k(scores, k):
+    """
+    每列取前 k 大：argpartition O(n) 選出 k 個，只對這 k 個排序
+
+    回傳：(idx, vals)，shape 皆為 (m, k)，分數由高到低
+    """
+    scores = np.asarray(scores)
+    n = scores.shape[1]
+    k = min(k, n)
+    if k < n:
+        idx = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    else:
+        idx = np.broadcast_to(np.arange(n), scores.shape).copy()
+    vals = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-vals, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+# =========================
+# 融合
+# =========================
+def rrf(score_lists, k=5, weights=None, rrf_k=RRF_K, depth=RRF_DEPTH):
+    """
+    Reciprocal Rank Fusion：每個來源取前 depth 名，分數 = Σ w / (rrf_k + rank)
+
+    只處理各來源的前 depth 名，不對整個語料排序。
+    回傳：(idx, vals)，shape (m, k')，k' = min(k, 候選數)
+    """
+    weights = weights or [1.0] * len(score_lists)
+    m, n = np.shape(score_lists[0])
+
+    ids, contrib = [], []
+    for scores, w in zip(score_lists, weights):
+        idx, _ = top_k(scores, depth)
+        ranks = np.arange(1, idx.shape[1] + 1, dtype=np.float32)
+        ids.append(idx)
+        contrib.append(np.broadcast_to(w / (rrf_k + ranks), idx.shape))
+    ids = np.concatenate(ids, axis=1)
+    contrib = np.concatenate(contrib, axis=1)
+
+    # (查詢, 文件) 合成一個 key，一次 unique + bincount 加總
+    rows = np.repeat(np.arange(m), ids.shape[1])
+    keys, inv = np.unique(rows * n + ids.ravel(), return_inverse=True)
+    fused = np.bincount(inv, weights=contrib.ravel()).astype(np.float32)
+    key_rows, key_ids = keys // n, keys % n
+
+    # 依 (查詢, -分數, 文件) 排序後，每個查詢取前 k 筆
+    order = np.lexsort((key_ids, -fused, key_rows))
+    key_rows, key_ids, fused = key_rows[order], key_ids[order], fused[order]
+    starts = np.searchsorted(key_rows, np.arange(m))
+    kk = min(k, int(np.bincount(key_rows, minlength=m).min()))
+    take = starts[:, None] + np.arange(kk)
+    return key_ids[take], fused[take]
+
+
+def fuse(score_lists, method="minmax", k=5, weights=None, **rrf_options):
+    """
+    多個來源的分數矩陣（各為 (m, n)，m 個查詢 × n 篇文件）融合後取 top-k
+
+    - method="minmax" / "zscore"：各來源每列正規化後加權相加
+    - method="rrf"：只看名次（見 rrf）
+    回傳：(idx, vals)，shape (m, k)
+    """
+    if method == "rrf":
+        return rrf(score_lists, k, weights, **rrf_options)
+
+    normalize = NORMALIZERS[method]
+    weights = weights or [1.0 / len(score_lists)] * len(score_lists)
+
+    total = None
+    for scores, w in zip(score_lists, weights):
+        part = normalize(scores)
+        part *= w
+        if total is None:
+            total = part
+        else:
+            total += part
+    return top_k(total, k)
@@ -0,0 +1,206 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pdfplumber
+import pytesseract
+from docx import Document
+from pdf2image import convert_from_path
+from PIL import Image
+
+from rag_common.extract_cache import ExtractionCache, file_hash, page_fingerprint
+
+# ═══════════════════════════════
+# 基本設定
+# ═══════════════════════════════
+OCR_LANG = "chi_tra+eng"
+OCR_DPI = 200                 # 頁面沒有內嵌圖片時的 OCR 解析度
+MIN_OCR_DPI = 150
+MAX_OCR_DPI = 300
+MAX_WORKERS = os.cpu_count()
+
+# 每頁判斷要用文字層還是 OCR
+MIN_PAGE_TEXT = 20            # 文字層少於這個字數 → OCR
+MIN_TEXT_DENSITY = 1.0        # 每平方英吋字數
+MAX_IMAGE_COVERAGE = 0.5      # 圖片蓋住超過一半頁面且字很稀疏 → 視為掃描頁
+
+# 提取結果快取：選項有變就會自動失效
+IDP_OPTIONS = {
+    "lang": OCR_LANG,
+    "dpi": [OCR_DPI, MIN_OCR_DPI, MAX_OCR_DPI],
+    "page_rule": [MIN_PAGE_TEXT, MIN_TEXT_DENSITY, MAX_IMAGE_COVERAGE],
+}
+document_cache = ExtractionCache("idp-document", IDP_OPTIONS)
+page_cache = ExtractionCache("idp-pdf-page", IDP_OPTIONS)
+
+
+# ═══════════════════════════════
+# 各種格式的提取（皆可在子行程中執行）
+# ═══════════════════════════════
+
+def _image_coverage(page):
+    area = float(page.width * page.height) or 1.0
+    covered = 0.0
+    for img in page.images:
+        w = max(0.0, min(img["x1"], page.width) - max(img["x0"], 0))
+        h = max(0.0, min(img["bottom"], page.height) - max(img["top"], 0))
+        covered += w * h
+    return min(covered / area, 1.0)
+
+
+def _page_dpi(page):
+    """依頁面內嵌圖片的原始解析度決定 OCR DPI，沒有圖片就用 OCR_DPI"""
+    dpis = []
+    for img in page.images:
+        width_in = (img["x1"] - img["x0"]) / 72
+        src_w = (img.get("srcsize") or (0, 0))[0]
+        if width_in > 0 and src_w:
+            dpis.append(src_w / width_in)
+    if not dpis:
+        return OCR_DPI
+    return int(min(max(max(dpis), MIN_OCR_DPI), MAX_OCR_DPI))
+
+
+def classify_pdf_page(page):
+    """
+    回傳 ("text", 文字) 或 ("ocr", dpi)
+
+    文字層夠多、且不是「大圖 + 少量文字」的掃描頁，就直接用文字層
+    """
+    text = page.extract_text() or ""
+    n = len(text.strip())
+    area_in2 = float(page.width * page.height) / (72 * 72) or 1.0
+    density = n / area_in2
+
+    if n < MIN_PAGE_TEXT:
+        return "ocr", _page_dpi(page)
+    if _image_coverage(page) >= MAX_IMAGE_COVERAGE and density < MIN_TEXT_DENSITY:
+        return "ocr", _page_dpi(page)
+    return "text", text
+
+
+def classify_pdf(path):
+    """
+    逐頁查快取，沒命中的頁面才判斷文字層 / OCR
+
+    回傳每頁的 (kind, value, 頁面雜湊)，kind 為 "cached" / "text" / "ocr"
+    """
+    results = []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            fp = page_fingerprint(page)
+            text = page_cache.get(fp)
+            if text is not None:
+                results.append(("cached", text, fp))
+                continue
+
+            kind, value = classify_pdf_page(page)
+            if kind == "text":
+                page_cache.put(fp, value)
+            results.append((kind, value, fp))
+    return results
+
+
+def extract_pdf_page_ocr(path, page_no, dpi=OCR_DPI, fingerprint=None):
+    """只把第 page_no 頁（從 1 開始）轉成圖片再 OCR，不會一次載入整份 PDF 的影像"""
+    images = convert_from_path(path, dpi=dpi, first_page=page_no, last_page=page_no)
+    text = pytesseract.image_to_string(images[0], lang=OCR_LANG)
+    if fingerprint:
+        page_cache.put(fingerprint, text)
+    return text
+
+
+def extract_image(path):
+    img = Image.open(path)
+    return pytesseract.image_to_string(img, lang=OCR_LANG)
+
+
+def extract_docx(path):
+    doc = Document(path)
+    return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
+
+
+def _extract_file(path):
+    """
+    第一階段（每個檔案一個 job）
+
+    PDF 回傳每頁的 (kind, value, 頁面雜湊)，其他格式回傳 [("text", 文字, None)]
+    """
+    path = str(path)
+    if path.endswith(".pdf"):
+        return classify_pdf(path)
+    if path.endswith(".png"):
+        return [("text", extract_image(path), None)]
+    if path.endswith(".docx"):
+        return [("text", extract_docx(path), None)]
+    return [("text", "", None)]
+
+
+# ═══════════════════════════════
+# 平行載入
+# ═══════════════════════════════
+
+def load_documents(base_dir, files, max_workers=MAX_WORKERS):
+    """
+    以 process pool 平行載入文件，結果會寫入提取快取
+
+    - 檔案內容沒變：直接讀快取，不開檔解析
+    - 第一階段：每個檔案一個 job；PDF 逐頁查快取，沒命中才判斷文字層是否可用
+    - 第二階段：只有需要 OCR 的頁面各自一個 job，以該頁自己的 DPI 轉圖，一次只轉一頁
+    - 結果依 files、頁碼的順序合併，每次執行順序都相同
+
+    回傳：{檔名: 文字}
+    """
+    base_dir = Path(base_dir)
+    names = [f for f in files if (base_dir / f).exists()]
+    hashes = {f: file_hash(base_dir / f) for f in names}
+
+    docs = {}
+    for f in names:
+        text = document_cache.get(hashes[f])
+        if text is not None:
+            docs[f] = text
+
+    pages = {}
+    counts = {"text": 0, "ocr": 0, "cached": 0}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_extract_file, str(base_dir / f)): f
+            for f in names if f not in docs
+        }
+        for fut in as_completed(futures):
+            f = futures[fut]
+            results = fut.result()
+            for i, (kind, value, fp) in enumerate(results):
+                if kind == "ocr":
+                    results[i] = pool.submit(
+                        extract_pdf_page_ocr, str(base_dir / f), i + 1, value, fp
+                    )
+            pages[f] = results
+
+        for f in names:
+            if f in docs:
+                print(f"📄 {f} → 快取 ({len(docs[f])} chars)")
+                continue
+
+            texts = []
+            for r in pages[f]:
+                if isinstance(r, tuple):
+                    kind, text, _ = r
+                    if f.endswith(".pdf"):
+                        counts[kind] += 1
+                else:
+                    text = r.result()
+                    counts["ocr"] += 1
+                if text:
+                    texts.append(text)
+            docs[f] = "\n".join(texts)
+            document_cache.put(hashes[f], docs[f])
+            print(f"📄 {f} → OK ({len(docs[f])} chars)")
+
+    print(
+        f"📊 PDF 頁面：文字層 {counts['text']} 頁，OCR {counts['ocr']} 頁，"
+        f"快取 {counts['cached']} 頁"
+    )
+    return {f: docs[f] for f in names}
@@ -0,0 +1,139 @@
+import hashlib
+import uuid
+
+from qdrant_client.models import Distance, PointIdsList
+
+from rag_common.ingest import (
+    BATCH_SIZE, batched, run_pipeline, make_qdrant_upsert, print_stats
+)
+
+SCROLL_LIMIT = 1000
+
+
+def chunk_id(source, text):
+    """由 (source, chunk 內容雜湊) 得到固定的 point id（UUID 字串）"""
+    h = hashlib.sha256()
+    h.update(source.encode("utf-8"))
+    h.update(b"\x00")
+    h.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return str(uuid.UUID(bytes=h.digest()[:16]))
+
+
+def point_id(chunk):
+    return chunk_id(chunk.get("source", ""), chunk["text"])
+
+
+def existing_ids(client, collection):
+    """
+    列出 collection 內所有 point id（不取 payload / 向量）
+
+    回傳 {str(id): 原本的 id}：比對用字串，刪除時要用原本的型別
+    （舊腳本建的 collection 是整數 id 0..n-1，用字串 "0" 刪不到）
+    """
+    ids = {}
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=SCROLL_LIMIT,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False
+        )
+        ids.update((str(p.id), p.id) for p in points)
+        if offset is None:
+            return ids
+
+
+def sync_collection(
+    client,
+    collection,
+    chunks,
+    embed_fn,
+    distance=Distance.COSINE,
+    batch_size=BATCH_SIZE,
+    payload_fn=None
+):
+    """
+    增量索引：跟 collection 現有內容比對後
+
+    - 新出現的 chunk：embed + upsert
+    - 已存在的 chunk：不動（不呼叫 embedding）
+    - 已消失的 chunk：從 collection 刪除
+
+    回傳：
+        summary: {"added", "kept", "deleted"}
+        stats: run_pipeline 的各階段統計
+    """
+    existing = {}
+    if client.collection_exists(collection):
+        existing = existing_ids(client, collection)
+
+    seen = set()
+
+    def new_chunks():
+        for c in chunks:
+            pid = point_id(c)
+            if pid in seen:
+                continue
+            seen.add(pid)
+            if pid not in existing:
+                yield c
+
+    stats = run_pipeline(
+        new_chunks(),
+        embed_fn,
+        make_qdrant_upsert(
+            client, collection, distance, recreate=False, id_fn=point_id, payload_fn=payload_fn
+        ),
+        batch_size=batch_size
+    )
+
+    vanished = [existing[pid] for pid in existing.keys() - seen]
+    for ids in batched(vanished, SCROLL_LIMIT):
+        client.delete(
+            collection_name=collection,
+            points_selector=PointIdsList(points=ids)
+        )
+
+    # 檢查：同步後的點數應該剛好等於這次的 chunk 數（例如舊的整數 id 沒刪掉就會對不上）
+    if seen:
+        n = client.count(collection, exact=True).count
+        if n != len(seen):
+            raise RuntimeError(
+                f"增量同步後 {collection} 有 {n} 個點，應為 {len(seen)} 個（舊 point 沒有被清掉）"
+            )
+
+    added = stats[2].items
+    summary = {"added": added, "kept": len(seen) - added, "deleted": len(vanished)}
+    return summary, stats
+
+
+def print_summary(summary):
+    print(
+        f"🔁 增量索引：新增 {summary['added']}，"
+        f"沿用 {summary['kept']}，刪除 {summary['deleted']}"
+    )
+
+
+def index_collection(
+    client,
+    collection,
+    chunks,
+    embed_fn,
+    distance=Distance.COSINE,
+    incremental=True,
+    payload_fn=None
+):
+    """incremental=True 走 sync_collection；False 則刪掉 collection 整個重建"""
+    if incremental:
+        summary, stats = sync_collection(
+            client, collection, chunks, embed_fn, distance, payload_fn=payload_fn
+        )
+        print_summary(summary)
+    else:
+        stats = run_pipeline(
+            chunks, embed_fn, make_qdrant_upsert(client, collection, distance, payload_fn=payload_fn)
+        )
+    print_stats(stats)
+    return stats
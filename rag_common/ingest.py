@@ -0,0 +1,240 @@
+import queue
+import threading
+import time
+
+from qdrant_client.models import VectorParams, Distance, PointStruct
+
+from rag_common.chunking import splitter_spans
+
+# =========================
+# 基本設定
+# =========================
+READ_BLOCK_CHARS = 1 << 20    # 每次從檔案讀 1M 字元
+BATCH_SIZE = 64               # 每批 embed / upsert 的 chunk 數
+QUEUE_SIZE = 2                # 各階段之間最多暫存幾批
+
+_DONE = object()
+
+
+# =========================
+# 讀檔 / 切塊（generator）
+# =========================
+def read_blocks(path, block_chars=READ_BLOCK_CHARS):
+    """逐塊讀取文字檔，不把整個檔案讀進記憶體"""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                break
+            yield block
+
+
+def iter_windows(blocks, chunk_size=500, overlap=0):
+    """
+    串流版的固定 / 滑動視窗切塊
+
+    切法與 CharacterTextSplitter(separator="") 相同，實際的切點交給 chunking.splitter_spans：
+    每讀進一塊，就把確定不是最後一塊的完整視窗（後面還有文字）一次切出來，
+    剩下不到一個視窗的尾巴留到最後，由 splitter_spans 當成最後一塊處理。
+    """
+    step = chunk_size - overlap
+    buf = ""
+    for block in blocks:
+        buf += block
+        rest = len(buf) - chunk_size
+        if rest <= 0:
+            continue
+        full = -(-rest // step)                  # 起點 + chunk_size < len(buf) 的視窗數
+        end = (full - 1) * step + chunk_size
+        yield from splitter_spans(buf[:end], chunk_size, overlap)
+        buf = buf[full * step:]
+
+    yield from splitter_spans(buf, chunk_size, overlap)
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# =========================
+# Pipeline
+# =========================
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    @property
+    def rate(self):
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.name:<8} {self.items:>8} chunks  {self.batches:>6} batches  "
+            f"{self.seconds:8.2f}s  {self.rate:10.1f} chunks/s"
+        )
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(chunks, embed_fn, upsert_fn, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE):
+    """
+    read → chunk → embed batch → upsert batch 串流 pipeline
+
+    - chunks：chunk dict（至少有 "text"）的 iterable，通常是 generator
+    - embed_fn(list[str]) -> np.ndarray
+    - upsert_fn(list[dict], np.ndarray) -> None
+
+    各階段各自一個 thread，中間用有上限的 queue 連接，
+    所以第 N+1 批在 embed 的同時第 N 批在 upsert，記憶體用量固定。
+
+    回傳：[StageStats(chunk), StageStats(embed), StageStats(upsert)]
+    """
+    stats = [StageStats("chunk"), StageStats("embed"), StageStats("upsert")]
+    q_chunks = queue.Queue(maxsize=queue_size)
+    q_vectors = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def produce():
+        st = stats[0]
+        try:
+            it = iter(batched(chunks, batch_size))
+            while True:
+                t0 = time.perf_counter()
+                batch = next(it, None)
+                st.seconds += time.perf_counter() - t0
+                if batch is None:
+                    break
+                st.items += len(batch)
+                st.batches += 1
+                if not _put(q_chunks, batch, stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(q_chunks, _DONE, stop)
+
+    def embed():
+        st = stats[1]
+        try:
+            while True:
+                batch = _get(q_chunks, stop)
+                if batch is _DONE:
+                    break
+                t0 = time.perf_counter()
+                vectors = embed_fn([c["text"] for c in batch])
+                st.seconds += time.perf_counter() - t0
+                st.items += len(batch)
+                st.batches += 1
+                if not _put(q_vectors, (batch, vectors), stop):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(q_vectors, _DONE, stop)
+
+    workers = [threading.Thread(target=produce), threading.Thread(target=embed)]
+    for w in workers:
+        w.start()
+
+    st = stats[2]
+    try:
+        while True:
+            item = _get(q_vectors, stop)
+            if item is _DONE:
+                break
+            batch, vectors = item
+            t0 = time.perf_counter()
+            upsert_fn(batch, vectors)
+            st.seconds += time.perf_counter() - t0
+            st.items += len(batch)
+            st.batches += 1
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for w in workers:
+            w.join()
+
+    if errors:
+        raise errors[0]
+    return stats
+
+
+def print_stats(stats):
+    print("📈 Pipeline 各階段吞吐量")
+    for st in stats:
+        print("  " + str(st))
+
+
+# =========================
+# Qdrant upsert
+# =========================
+def make_qdrant_upsert(
+    client, collection, distance=Distance.COSINE, recreate=True, id_fn=None, payload_fn=None
+):
+    """
+    回傳給 run_pipeline 用的 upsert_fn
+
+    第一批進來時才依向量維度建立 collection，payload 預設就是 chunk dict 本身，
+    給定 payload_fn(chunk) 時改用它的結果（例如 chunk_store.without_text）。
+    id 預設依序遞增；給定 id_fn(chunk) 時改用它算出的 id。
+    """
+    state = {"next_id": 0, "ready": False}
+
+    def upsert(batch, vectors):
+        if not state["ready"]:
+            if recreate and client.collection_exists(collection):
+                client.delete_collection(collection)
+            if not client.collection_exists(collection):
+                client.create_collection(
+                    collection_name=collection,
+                    vectors_config=VectorParams(
+                        size=vectors.shape[1],
+                        distance=distance
+                    )
+                )
+            state["ready"] = True
+
+        start = state["next_id"]
+        points = [
+            PointStruct(
+                id=id_fn(c) if id_fn else start + i,
+                vector=v.tolist(),
+                payload=payload_fn(c) if payload_fn else c
+            )
+            for i, (c, v) in enumerate(zip(batch, vectors))
+        ]
+        client.upsert(collection_name=collection, points=points)
+        state["next_id"] = start + len(points)
+
+    return upsert
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import weakref
+
+import httpx
+from deepeval.models import DeepEvalBaseLLM
+from openai import AsyncOpenAI, OpenAI
+
+from rag_common.rate_limit import get_limiter
+
+# =========================
+# 基本設定
+# =========================
+JUDGE_BASE_URL = "https://ws-06.huannago.com/v1"
+JUDGE_MODEL = "gemma-3-27b-it"
+API_KEY = "NoNeed"
+
+TEMPERATURE = 0.1
+MAX_CONCURRENCY = 8      # 同時在路上的 judge 呼叫數（同步 + 非同步各自計算）
+TIMEOUT = 120            # 單次呼叫逾時秒數
+
+
+class JudgeLLM(DeepEvalBaseLLM):
+    """
+    DeepEval 用的 OpenAI 相容 judge model（llama.cpp / vLLM 等）
+
+    - 同步 client 建一次重複使用（keep-alive 連線池），不再每個 prompt 都 new OpenAI()
+    - a_generate 走真正的 AsyncOpenAI，DeepEval 的 async 模式可以同時送出多個 judge 呼叫
+    - 同步 / 非同步都以 MAX_CONCURRENCY 限制同時呼叫數
+    - 速率與重試交給同一個 base_url 共用的 AdaptiveRateLimiter（AIMD + 指數退避），
+      openai client 本身不重試，避免兩層重試疊加；rate / max_retries 為 None 時沿用 limiter 的設定
+    - AsyncOpenAI 與 semaphore 綁定 event loop，每個 loop 各建一份，loop 結束（asyncio.run 收尾）時自動關閉
+    """
+
+    def __init__(
+        self,
+        base_url=JUDGE_BASE_URL,
+        model_name=JUDGE_MODEL,
+        api_key=API_KEY,
+        temperature=TEMPERATURE,
+        max_concurrency=MAX_CONCURRENCY,
+        timeout=TIMEOUT,
+        max_retries=None,
+        rate=None
+    ):
+        self.base_url = base_url
+        self.model_name = model_name
+        self.api_key = api_key
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.limiter = get_limiter(base_url, rate=rate, max_retries=max_retries)
+        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self._async = weakref.WeakKeyDictionary()    # event loop → (AsyncOpenAI, Semaphore, closer)
+        super().__init__(model_name)
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency
+        )
+
+    def load_model(self):
+        self.client = OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            timeout=self.timeout,
+            max_retries=0,
+            http_client=httpx.Client(limits=self._limits(), timeout=self.timeout)
+        )
+        return self.client
+
+    async def _async_client(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._async:
+            client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=self._limits(), timeout=self.timeout)
+            )
+
+            # 停在 yield 的 async generator：loop 收尾時 shutdown_asyncgens() 會執行 finally，
+            # 在同一個 loop 裡關掉這個 loop 的連線池
+            async def closer():
+                try:
+                    yield
+                finally:
+                    self._async.pop(loop, None)
+                    await client.close()
+
+            gen = closer()
+            await gen.__anext__()
+            self._async[loop] = (client, asyncio.Semaphore(self.max_concurrency), gen)
+        client, sem, _ = self._async[loop]
+        return client, sem
+
+    def _request(self, prompt):
+        return {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+        }
+
+    def generate(self, prompt: str) -> str:
+        def create():
+            with self._sem:
+                return self.client.chat.completions.create(**self._request(prompt))
+
+        response = self.limiter.call(create)
+        return response.choices[0].message.content
+
+    async def a_generate(self, prompt: str) -> str:
+        client, sem = await self._async_client()
+
+        async def create():
+            async with sem:
+                return await client.chat.completions.create(**self._request(prompt))
+
+        response = await self.limiter.a_call(create)
+        return response.choices[0].message.content
+
+    def get_model_name(self):
+        return f"Llama.cpp ({self.model_name})"
+
+    def close(self):
+        """關閉同步 client，以及還沒隨 loop 結束而關閉的 async client"""
+        self.client.close()
+        for loop, (_, _, gen) in list(self._async.items()):
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(gen.aclose())
+        self._async.clear()
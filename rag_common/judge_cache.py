@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+# ═══════════════════════════════
+# 基本設定
+# ═══════════════════════════════
+CACHE_DIR = Path(
+    os.environ.get("RAG_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache")
+) / "judge"
+
+CASE_FIELDS = ["input", "actual_output", "expected_output", "context", "retrieval_context"]
+
+
+def metric_name(metric):
+    """metric 名稱（Faithfulness / Answer Relevancy ...）；strict_mode 分數會被二值化，分開存"""
+    name = getattr(metric, "__name__", type(metric).__name__)
+    return f"{name} (strict)" if getattr(metric, "strict_mode", False) else name
+
+
+def judge_name(metric):
+    """metric 使用的 judge model 名稱（DeepEval 在 metric 建立時填入 evaluation_model）"""
+    name = getattr(metric, "evaluation_model", None)
+    if name:
+        return name
+    model = getattr(metric, "model", None)
+    return model.get_model_name() if model is not None else ""
+
+
+def metric_fields(metric):
+    """
+    這個 metric 實際會讀的 test case 欄位（DeepEval 的 _required_params）
+
+    例如 Answer Relevancy 只看 input / actual_output：只換 retriever 時它的分數可以直接沿用；
+    讀不到時保守地用全部欄位
+    """
+    params = getattr(metric, "_required_params", None)
+    if not params:
+        return CASE_FIELDS
+    return sorted(getattr(p, "value", str(p)) for p in params)
+
+
+def fields_hash(test_case, fields):
+    data = {f: getattr(test_case, f, None) for f in fields}
+    return hashlib.sha256(
+        json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class JudgeCache:
+    """
+    DeepEval judge 結果的持久化快取
+
+    key = (metric 名稱, judge model, 該 metric 用到的 test case 欄位雜湊)，value = 分數 + reason，
+    每筆存成一個小 JSON 檔（寫入用 os.replace，多個 process 同時評估也安全）。
+    跨 script、跨輸出檔共用：只換 retriever 重新評估時，context 沒變的題目不會再呼叫 judge。
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.dir = Path(cache_dir)
+
+    def _path(self, metric, test_case):
+        h = hashlib.sha256(
+            "\0".join([
+                metric_name(metric),
+                judge_name(metric),
+                fields_hash(test_case, metric_fields(metric))
+            ]).encode("utf-8")
+        ).hexdigest()
+        return self.dir / h[:2] / f"{h}.json"
+
+    def get(self, metric, test_case):
+        """回傳 (score, reason)；沒有快取時回傳 None"""
+        p = self._path(metric, test_case)
+        if not p.exists():
+            return None
+        with open(p, encoding="utf-8") as f:
+            data = json.load(f)
+        return data["score"], data["reason"]
+
+    def put(self, metric, test_case, score, reason):
+        p = self._path(metric, test_case)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "metric": metric_name(metric),
+                "judge": judge_name(metric),
+                "score": score,
+                "reason": reason
+            }, f, ensure_ascii=False)
+        os.replace(tmp, p)
@@ -0,0 +1,98 @@
+import json
+import os
+from pathlib import Path
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance
+
+from rag_common.extract_cache import file_hash
+from rag_common.incremental import index_collection
+from rag_common.vector_store import BACKEND, NumpyVectorStore
+
+# ═══════════════════════════════
+# 基本設定
+# ═══════════════════════════════
+INDEX_DIR = Path(
+    os.environ.get("RAG_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache")
+) / "qdrant"
+
+MANIFEST = "manifest.json"
+
+
+def corpus_hashes(base_dir, files):
+    """{檔名: 內容雜湊}，不存在的檔案略過"""
+    base_dir = Path(base_dir)
+    return {f: file_hash(base_dir / f) for f in files if (base_dir / f).exists()}
+
+
+def _read_manifest(path):
+    p = path / MANIFEST
+    if not p.exists():
+        return None
+    with open(p, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(path, manifest):
+    p = path / MANIFEST
+    tmp = p.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, p)
+
+
+def open_local_index(
+    name,
+    collection,
+    docs,
+    chunks_fn,
+    embed_fn,
+    config=None,
+    distance=Distance.COSINE,
+    index_dir=INDEX_DIR
+):
+    """
+    開啟存在磁碟上的本地 Qdrant 索引，重啟後直接沿用
+
+    - docs：{檔名: 內容雜湊}（見 corpus_hashes），config：切塊 / embedding 等設定
+    - 兩者都和上次建索引時相同 → 不讀文件、不呼叫 embedding，直接回傳 client
+    - 只有 docs 變動 → 呼叫 chunks_fn() 取得 chunks，以增量方式同步（只 embed 變動的 chunk）
+    - config 變動（或沒有上次的 manifest）→ 刪掉 collection 從頭重建：
+      point id 只由 (source, text) 決定，沿用的話舊模型 / 舊設定的向量會留在索引裡
+    - 向量維度由第一批 embedding 結果決定，不另外送測試字串
+
+    回傳：QdrantClient（同一個 path 同時只能有一個 client 開啟），
+    RAG_VECTOR_BACKEND=numpy 時為 NumpyVectorStore
+    """
+    path = Path(index_dir) / name
+    path.mkdir(parents=True, exist_ok=True)
+    if BACKEND == "numpy":
+        client = NumpyVectorStore(path)
+    else:
+        client = QdrantClient(path=str(path))
+
+    manifest = {
+        "collection": collection,
+        "docs": docs,
+        "config": config or {},
+    }
+    previous = _read_manifest(path)
+    exists = client.collection_exists(collection)
+    if previous == manifest and exists:
+        n = client.count(collection, exact=True).count
+        print(f"♻️ 沿用本地索引 {path}（{n} 個 chunks，文件未變動）")
+        return client
+
+    stale = previous is None or {k: v for k, v in previous.items() if k != "docs"} != {
+        k: v for k, v in manifest.items() if k != "docs"
+    }
+    if stale and exists:
+        # 空的 collection 再走增量同步 = 全部重新 embed，point id 仍是 (source, text)，之後的增量同步照常
+        print(f"🧹 索引設定變動，重建 collection {collection}")
+        client.delete_collection(collection)
+
+    index_collection(client, collection, chunks_fn(), embed_fn, distance)
+    if isinstance(client, NumpyVectorStore):
+        client.save()
+    _write_manifest(path, manifest)
+    return client
@@ -0,0 +1,96 @@
+import os
+
+from qdrant_client import models
+
+# ═══════════════════════════════
+# 基本設定
+# ═══════════════════════════════
+# ⭐ 建 collection 時用哪個 profile（見 PROFILES）；預設不量化，要用 int8 / binary 請設定環境變數
+#   （例如 RAG_QUANT_PROFILE=int8_ondisk，先用 CW/01/bench_quantization.py 確認召回率）
+PROFILE = os.environ.get("RAG_QUANT_PROFILE", "float32")
+
+HNSW_M = 16                 # Qdrant 預設；每個向量約 2 * m 條連結、每條 4 bytes
+
+_SCALAR = models.ScalarQuantization(
+    scalar=models.ScalarQuantizationConfig(
+        type=models.ScalarType.INT8,
+        quantile=0.99,          # 去掉 1% 極端值再決定 int8 的範圍
+        always_ram=True
+    )
+)
+
+_BINARY = models.BinaryQuantization(
+    binary=models.BinaryQuantizationConfig(always_ram=True)
+)
+
+# 每個 profile：
+# - quantization：量化設定（None = 只存 float32）
+# - on_disk：原始 float32 向量放磁碟（mmap），RAM 只留量化向量
+# - oversampling：先用量化向量取 limit * oversampling 筆，再用原始向量重新排序
+PROFILES = {
+    "float32": {"quantization": None, "on_disk": False, "oversampling": None},
+    "int8": {"quantization": _SCALAR, "on_disk": False, "oversampling": 2.0},
+    "int8_ondisk": {"quantization": _SCALAR, "on_disk": True, "oversampling": 2.0},
+    "binary": {"quantization": _BINARY, "on_disk": False, "oversampling": 3.0},
+    "binary_ondisk": {"quantization": _BINARY, "on_disk": True, "oversampling": 3.0},
+}
+
+
+def _get(profile):
+    if profile not in PROFILES:
+        raise ValueError(f"未知的量化 profile：{profile}（可用：{', '.join(PROFILES)}）")
+    return PROFILES[profile]
+
+
+def collection_config(size, distance, profile=PROFILE):
+    """
+    create_collection 的參數：client.create_collection(name, **collection_config(4096, Distance.COSINE))
+
+    binary 量化只保留每一維的正負號，適合 cosine；dot / euclid 建議用 int8
+    """
+    p = _get(profile)
+    config = {
+        "vectors_config": models.VectorParams(
+            size=size,
+            distance=distance,
+            on_disk=p["on_disk"]
+        )
+    }
+    if p["quantization"] is not None:
+        config["quantization_config"] = p["quantization"]
+    return config
+
+
+def search_params(profile=PROFILE):
+    """查詢時的 params：量化 profile 一律以原始向量 rescore；float32 回傳 None"""
+    p = _get(profile)
+    if p["quantization"] is None:
+        return None
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            rescore=True,
+            oversampling=p["oversampling"]
+        )
+    )
+
+
+def memory_estimate(n_vectors, dim, profile=PROFILE, hnsw_m=HNSW_M):
+    """
+    粗估 (RAM bytes, 磁碟 bytes)，不含 payload
+
+    float32 每維 4 bytes、int8 每維 1 byte、binary 每維 1 bit，
+    HNSW 連結約 n * 2m * 4 bytes；on_disk 的原始向量只算在磁碟。
+    """
+    p = _get(profile)
+    original = n_vectors * dim * 4
+    if isinstance(p["quantization"], models.ScalarQuantization):
+        quantized = n_vectors * dim
+    elif isinstance(p["quantization"], models.BinaryQuantization):
+        quantized = n_vectors * ((dim + 7) // 8)
+    else:
+        quantized = 0
+    links = n_vectors * 2 * hnsw_m * 4
+
+    ram = quantized + links + (0 if p["on_disk"] else original)
+    disk = original + quantized + links
+    return ram, disk
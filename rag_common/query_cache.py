@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+# =========================
+# 基本設定
+# =========================
+MAX_QUERIES = 4096     # 記憶體中最多保留幾個查詢向量，超過就淘汰最久沒用到的
+
+
+class QueryEmbeddingCache:
+    """
+    查詢向量的 in-process LRU 快取
+
+    同一個問題拿去查好幾個 collection 時只 embed 一次。
+    - embed_fn(list[str]) -> np.ndarray (n, dim)，通常是 EmbeddingClient.embed
+    - persist：選填的 EmbeddingCache，沒命中記憶體時先查磁碟，重啟後仍可命中
+    - hits / disk_hits / misses 計數：misses 才是真的送出去的 embedding 請求
+    - embed_fn 在鎖外執行：不同問題可以同時 embed；同一個問題正在算時，其他 thread 等同一個 Future
+    """
+
+    def __init__(self, embed_fn, max_size=MAX_QUERIES, persist=None, normalize=True, variant=""):
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+        self.persist = persist
+        self.normalize = normalize
+        self.variant = variant         # 磁碟層的 key 變體（EmbeddingClient.cache_variant）
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()      # text -> 向量，最舊的在前面
+        self._pending = {}             # text -> Future，正在 embed 的問題
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _compute(self, texts):
+        """回傳 (向量, 磁碟命中數)"""
+        if self.persist is None:
+            return self.embed_fn(texts), 0
+
+        before = self.persist.hits
+        out = self.persist.get_or_compute(texts, self.embed_fn, self.normalize, self.variant)
+        return out, self.persist.hits - before
+
+    def embed(self, texts):
+        """回傳：np.ndarray (len(texts), dim)，float32；只對沒命中的問題呼叫 embed_fn"""
+        texts = list(texts)
+        found = {}
+        waiting = {}
+        mine = []
+        with self._lock:
+            for t in dict.fromkeys(texts):
+                if t in self._lru:
+                    self._lru.move_to_end(t)
+                    found[t] = self._lru[t]
+                    self.hits += 1
+                elif t in self._pending:
+                    waiting[t] = self._pending[t]
+                    self.hits += 1
+                else:
+                    self._pending[t] = Future()
+                    mine.append(t)
+
+        if mine:
+            try:
+                computed, disk = self._compute(mine)
+                computed = np.asarray(computed, dtype=np.float32)
+            except BaseException as e:
+                with self._lock:
+                    for t in mine:
+                        self._pending.pop(t).set_exception(e)
+                raise
+
+            with self._lock:
+                self.disk_hits += disk
+                self.misses += len(mine) - disk
+                for t, v in zip(mine, computed):
+                    v = v.copy()
+                    v.setflags(write=False)
+                    found[t] = self._lru[t] = v
+                    self._pending.pop(t).set_result(v)
+                while len(self._lru) > self.max_size:
+                    self._lru.popitem(last=False)
+
+        for t, fut in waiting.items():
+            found[t] = fut.result()
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([found[t] for t in texts])
+
+    def embed_one(self, text):
+        """單一問題的查詢向量（1-D，唯讀）"""
+        return self.embed([text])[0]
+
+    def __len__(self):
+        return len(self._lru)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": len(self._lru),
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        total = s["hits"] + s["disk_hits"] + s["misses"]
+        saved = s["hits"] + s["disk_hits"]
+        print(
+            f"🧠 查詢向量快取：記憶體命中 {s['hits']}，磁碟命中 {s['disk_hits']}，"
+            f"送出請求 {s['misses']}（省下 {saved}/{total} 次 embedding 請求）"
+        )
+
+
+def query_cache_for(client, max_size=MAX_QUERIES, normalize=True):
+    """
+    幫 EmbeddingClient 建一個查詢向量快取
+
+    磁碟層直接沿用 client 自己的 EmbeddingCache（沒有就只有記憶體層），
+    兩層都沒命中才真的呼叫 embedding API。
+    """
+    return QueryEmbeddingCache(
+        lambda texts: client.embed_uncached(texts, normalize),
+        max_size=max_size,
+        persist=client.cache,
+        normalize=normalize,
+        variant=client.cache_variant
+    )
@@ -0,0 +1,257 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+# =========================
+# 基本設定
+# =========================
+RATE = 4.0               # 初始每秒請求數
+MIN_RATE = 0.2           # 再怎麼降速也不低於這個值
+MAX_RATE = 50.0          # 加速的上限
+BURST = 4                # 閒置後最多可以連續送出幾個（token bucket 容量）
+INCREASE = 1.0           # AIMD 加法增量：持續成功時每秒約 +INCREASE req/s
+DECREASE = 0.5           # AIMD 乘法減量：被限流時 rate *= DECREASE
+COOLDOWN = 1.0           # 兩次降速至少間隔幾秒（同一波 429 只降一次）
+MAX_RETRIES = 5          # 429 / 5xx / 逾時最多重試幾次
+BACKOFF_BASE = 0.5       # 指數退避：第 n 次重試最多等 BACKOFF_BASE * 2^n 秒（full jitter）
+BACKOFF_MAX = 30.0
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+SETTINGS = ("rate", "min_rate", "max_rate", "burst", "max_retries")
+
+
+def _status(exc):
+    """requests / httpx / openai 的例外都可以從 status_code 或 response.status_code 取得狀態碼"""
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(exc):
+    """429 / 5xx / 逾時 / 連線中斷 → 退避後重試；其他錯誤（400、401、解析失敗等）直接拋出"""
+    if isinstance(exc, (TimeoutError, requests.Timeout, requests.ConnectionError)):
+        return True
+    name = type(exc).__name__
+    if "Timeout" in name or "Connection" in name:     # openai.APITimeoutError / httpx.ConnectError 等
+        return True
+    return _status(exc) in RETRY_STATUS
+
+
+def retry_after(exc):
+    """伺服器用 Retry-After 指定的等待秒數（沒有或無法解析時回傳 None）"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+    try:
+        return min(float(value), BACKOFF_MAX)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    token bucket + AIMD 的自適應限速器，附指數退避重試
+
+    - 每次呼叫先取一個 token，桶子以 rate 個 / 秒補充，最多存 BURST 個
+    - 成功就慢慢加速（rate += INCREASE / rate），遇到 429 / 5xx / 逾時就減半並退避重試
+    - 同步（call）與非同步（a_call）共用同一個桶，thread / event loop 之間都安全
+    - stats() / print_stats() 回報實際 QPS、重試與限流次數
+
+    取代固定的 time.sleep：伺服器閒時不白等，過載時會自動退讓。
+    """
+
+    def __init__(
+        self,
+        name,
+        rate=RATE,
+        min_rate=MIN_RATE,
+        max_rate=MAX_RATE,
+        burst=BURST,
+        max_retries=MAX_RETRIES
+    ):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self._config = {k: getattr(self, k) for k in SETTINGS}   # 設定值（rate 為起始速率）
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._last_cut = 0.0
+
+        self.requests = 0        # 實際送出的次數（含重試）
+        self.ok = 0
+        self.retries = 0
+        self.throttles = 0       # 因限流而降速的次數
+        self.failures = 0        # 重試用完或不可重試而拋出的次數
+        self._first = None
+        self._last = None
+
+    def configure(self, **settings):
+        """
+        套用新的設定（None 表示不改），回傳實際有變動的項目
+
+        與上次設定的值比較，而不是 AIMD 調整後的目前速率：同樣的設定重複套用不會打斷自適應
+        """
+        unknown = set(settings) - set(SETTINGS)
+        if unknown:
+            raise TypeError(f"未知的 limiter 設定：{', '.join(sorted(unknown))}")
+        changed = {}
+        with self._lock:
+            for k, v in settings.items():
+                if v is None or self._config[k] == v:
+                    continue
+                self._config[k] = v
+                setattr(self, k, v)
+                changed[k] = v
+            self._tokens = min(self._tokens, self.burst)
+        return changed
+
+    # ---------- token bucket ----------
+
+    def _reserve(self):
+        """取一個 token（可預支），回傳呼叫端要等幾秒"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            self.requests += 1
+            if self._first is None:
+                self._first = now
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def a_acquire(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    # ---------- AIMD ----------
+
+    def _on_success(self):
+        with self._lock:
+            self.ok += 1
+            self._last = time.monotonic()
+            self.rate = min(self.max_rate, self.rate + INCREASE / self.rate)
+
+    def _backoff(self, exc, attempt):
+        """回傳重試前要等幾秒；不該重試時回傳 None"""
+        if not is_retryable(exc) or attempt >= self.max_retries:
+            with self._lock:
+                self.failures += 1
+            return None
+
+        with self._lock:
+            self.retries += 1
+            now = time.monotonic()
+            if now - self._last_cut >= COOLDOWN:
+                self._last_cut = now
+                self.throttles += 1
+                self.rate = max(self.min_rate, self.rate * DECREASE)
+                print(f"  🐢 {self.name} 被限流（{_status(exc) or type(exc).__name__}），降速為 {self.rate:.2f} req/s")
+
+        delay = retry_after(exc)
+        if delay is None:
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        return delay
+
+    # ---------- 呼叫 ----------
+
+    def call(self, fn, *args, **kwargs):
+        """限速 + 重試地呼叫 fn(*args, **kwargs)"""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success()
+            return result
+
+    async def a_call(self, fn, *args, **kwargs):
+        """call 的非同步版本：fn 為 async 函式"""
+        attempt = 0
+        while True:
+            await self.a_acquire()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._on_success()
+            return result
+
+    # ---------- 統計 ----------
+
+    def stats(self):
+        span = (self._last - self._first) if self._last and self._first else 0.0
+        return {
+            "requests": self.requests,
+            "ok": self.ok,
+            "retries": self.retries,
+            "throttles": self.throttles,
+            "failures": self.failures,
+            "qps": self.ok / span if span > 0 else 0.0,
+            "rate": self.rate,
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        print(
+            f"🚦 {self.name}：成功 {s['ok']}/{s['requests']} 次，實際 {s['qps']:.2f} QPS，"
+            f"重試 {s['retries']}，限流 {s['throttles']}，失敗 {s['failures']}"
+            f"（目前速率 {s['rate']:.2f} req/s）"
+        )
+
+
+# =========================
+# 同一個服務共用一個 limiter
+# =========================
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name, **kwargs):
+    """
+    依服務名稱（通常是 base URL）取得共用的 limiter
+
+    同一個服務的所有 client（例如回答用的 LLM 與 DeepEval judge）共用同一個桶，速率一起調整。
+    kwargs 為 None 的項目沿用現有設定；limiter 已存在時，和之前不同的設定會套用上去並印出提示
+    """
+    settings = {k: v for k, v in kwargs.items() if v is not None}
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveRateLimiter(name, **settings)
+            return _limiters[name]
+        limiter = _limiters[name]
+    changed = limiter.configure(**settings)
+    if changed:
+        print(f"  ⚙️ {name} 的 limiter 已存在，套用新設定：{changed}")
+    return limiter
+
+
+def print_stats():
+    """印出所有用過的 limiter 的統計"""
+    for limiter in _limiters.values():
+        if limiter.requests:
+            limiter.print_stats()
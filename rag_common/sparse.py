@@ -0,0 +1,80 @@
+import zlib
+from collections import Counter
+
+from qdrant_client import models
+
+from rag_common.bm25 import B, K1, cjk_bigrams
+
+# =========================
+# 基本設定
+# =========================
+SPARSE_MODIFIER = models.Modifier.IDF   # idf 交給 Qdrant 依整個 collection 計算
+
+
+def sparse_vector_params(on_disk=False):
+    """建立 collection 時的 sparse 設定：idf 由 server 端算，文件向量只存 tf 部分"""
+    return models.SparseVectorParams(
+        index=models.SparseIndexParams(on_disk=on_disk),
+        modifier=SPARSE_MODIFIER
+    )
+
+
+def term_id(term):
+    """詞 → sparse index（crc32，32 bit 無號整數），查詢端不需要詞表"""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _to_sparse(weights):
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[float(weights[i]) for i in indices])
+
+
+class SparseBM25Encoder:
+    """
+    本地 BM25 sparse encoder（不連網、不下載模型）
+
+    - 文件向量：每個詞 tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avgdl))
+    - 查詢向量：每個詞的出現次數
+    - collection 設 modifier=IDF（見 sparse_vector_params），內積即為 BM25 分數
+
+    斷詞預設為 cjk_bigrams（與 rag_common.bm25 相同），
+    Qdrant/bm25 的英文斷詞會把中文整段丟掉，中文語料查不到東西。
+    avgdl 需先以整個語料 fit()，之後可分批 encode_documents。
+    """
+
+    def __init__(self, tokenizer=cjk_bigrams, k1=K1, b=B):
+        self.tokenizer = tokenizer
+        self.k1 = k1
+        self.b = b
+        self.avgdl = None
+
+    def fit(self, texts):
+        lengths = [len(self.tokenizer(t)) for t in texts]
+        self.avgdl = sum(lengths) / len(lengths) if lengths else 1.0
+        return self
+
+    def _term_weights(self, tokens):
+        weights = Counter()
+        for term, n in Counter(tokens).items():
+            weights[term_id(term)] += n
+        return weights
+
+    def encode_documents(self, texts):
+        if self.avgdl is None:
+            raise RuntimeError("encode_documents 前需要先 fit(整個語料)")
+
+        vectors = []
+        for text in texts:
+            tokens = self.tokenizer(text)
+            norm = self.k1 * (1 - self.b + self.b * len(tokens) / (self.avgdl or 1.0))
+            tf = self._term_weights(tokens)
+            vectors.append(_to_sparse({
+                i: n * (self.k1 + 1) / (n + norm) for i, n in tf.items()
+            }))
+        return vectors
+
+    def encode_queries(self, texts):
+        return [_to_sparse(self._term_weights(self.tokenizer(t))) for t in texts]
+
+    def encode_query(self, text):
+        return self.encode_queries([text])[0]
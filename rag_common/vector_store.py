@@ -0,0 +1,371 @@
+import atexit
+import json
+import os
+import shutil
+import weakref
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+# =========================
+# 基本設定
+# =========================
+QDRANT_URL = "http://localhost:6333"
+
+# RAG_VECTOR_BACKEND=numpy → 不需要 Qdrant server，向量存在本機（RAG_VECTOR_PATH）
+BACKEND = os.environ.get("RAG_VECTOR_BACKEND", "qdrant")
+STORE_DIR = Path(
+    os.environ.get(
+        "RAG_VECTOR_PATH",
+        Path(os.environ.get("RAG_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache"))
+        / "vectors"
+    )
+)
+
+INIT_CAPACITY = 1024          # 每個 collection 初始列數，不夠時倍增
+SCORE_BLOCK = 1 << 24         # 一次 matmul 最多產生幾個分數（約 64 MB float32）
+IGNORED_QUERY_ARGS = {"timeout", "consistency", "shard_key_selector"}   # 本機搜尋沒有意義，直接忽略
+
+
+def get_client(url=QDRANT_URL):
+    """依 RAG_VECTOR_BACKEND 回傳 QdrantClient 或本機的 NumpyVectorStore"""
+    if BACKEND == "numpy":
+        return NumpyVectorStore(STORE_DIR)
+    return QdrantClient(url=url)
+
+
+class _Collection:
+    """一個 collection：連續的 float32 矩陣 + id / payload，刪除時把最後一列搬進空位"""
+
+    def __init__(self, dim, distance, vectors=None, ids=None, payloads=None):
+        self.dim = dim
+        self.distance = distance
+        self.ids = list(ids or [])
+        self.payloads = list(payloads or [])
+        self.rows = {pid: i for i, pid in enumerate(self.ids)}
+
+        if vectors is None:
+            vectors = np.empty((INIT_CAPACITY, dim), dtype=np.float32)
+        self.vectors = vectors          # 讀檔時是唯讀 memmap，第一次寫入才複製
+        self.sq_norms = None            # euclid 用的 ||x||²，需要時才算
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def matrix(self):
+        return self.vectors[:len(self.ids)]
+
+    def _writable(self, need):
+        cap = len(self.vectors)
+        if isinstance(self.vectors, np.memmap) or need > cap:
+            new = np.empty((max(need, cap * 2, INIT_CAPACITY), self.dim), dtype=np.float32)
+            new[:len(self.ids)] = self.matrix
+            self.vectors = new
+
+    def upsert(self, ids, vectors, payloads):
+        if self.distance == models.Distance.COSINE:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+
+        new_ids = [pid for pid in dict.fromkeys(ids) if pid not in self.rows]
+        self._writable(len(self.ids) + len(new_ids))
+        for pid in new_ids:
+            self.rows[pid] = len(self.ids)
+            self.ids.append(pid)
+            self.payloads.append(None)
+
+        rows = np.fromiter((self.rows[pid] for pid in ids), dtype=np.int64, count=len(ids))
+        self.vectors[rows] = vectors
+        for r, p in zip(rows.tolist(), payloads):
+            self.payloads[r] = p
+        self.sq_norms = None
+
+    def delete(self, ids):
+        self._writable(len(self.ids))
+        for pid in ids:
+            r = self.rows.pop(pid, None)
+            if r is None:
+                continue
+            last = len(self.ids) - 1
+            if r != last:
+                self.vectors[r] = self.vectors[last]
+                self.ids[r] = self.ids[last]
+                self.payloads[r] = self.payloads[last]
+                self.rows[self.ids[r]] = r
+            self.ids.pop()
+            self.payloads.pop()
+        self.sq_norms = None
+
+    def search(self, queries, limit):
+        """
+        queries (m, dim) → (rows, scores)，各為 (m, k)，依相似度由好到差
+
+        分數定義與 Qdrant 相同：cosine / dot 越大越好，euclid 為距離、越小越好
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        n = len(self.ids)
+        k = min(limit, n)
+        m = len(queries)
+        if k == 0:
+            return np.empty((m, 0), np.int64), np.empty((m, 0), np.float32)
+
+        if self.distance == models.Distance.COSINE:
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        elif self.distance == models.Distance.EUCLID and self.sq_norms is None:
+            self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        elif self.distance not in (models.Distance.DOT, models.Distance.EUCLID):
+            raise ValueError(f"NumpyVectorStore 不支援 {self.distance} 距離")
+
+        X = self.matrix
+        step = max(1, SCORE_BLOCK // n)
+        out_rows = np.empty((m, k), np.int64)
+        out_scores = np.empty((m, k), np.float32)
+
+        for s in range(0, m, step):
+            Q = queries[s:s + step]
+            sims = Q @ X.T
+            if self.distance == models.Distance.EUCLID:
+                # 以 -||x - q||² 排序（||q||² 對同一個 query 是常數，最後再加回去）
+                sims = 2 * sims - self.sq_norms
+
+            if k < n:
+                top = np.argpartition(sims, n - k, axis=1)[:, n - k:]
+            else:
+                top = np.broadcast_to(np.arange(n), (len(Q), n))
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_sims = np.take_along_axis(top_sims, order, axis=1)
+
+            if self.distance == models.Distance.EUCLID:
+                q_sq = np.einsum("ij,ij->i", Q, Q)[:, None]
+                top_sims = np.sqrt(np.maximum(q_sq - top_sims, 0))
+
+            out_rows[s:s + step] = top
+            out_scores[s:s + step] = top_sims
+        return out_rows, out_scores
+
+
+class NumpyVectorStore:
+    """
+    不需要 server 的本機向量庫，介面與 QdrantClient 常用的部分相同
+
+    - create_collection / collection_exists / delete_collection / count
+    - upsert / delete（PointIdsList）/ scroll
+    - query_points / query_batch_points：批次 matmul + argpartition 取 top-k
+    - 給定 path 時，程式結束（或 close()）會把向量存成 float32 檔，下次以 np.memmap 開啟
+
+    只支援單一（未命名）向量、不支援 filter / prefetch / sparse。
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self._collections = {}
+        self._dirty = set()
+
+        if self.path is not None and self.path.exists():
+            for d in sorted(self.path.iterdir()):
+                if (d / "meta.json").exists():
+                    self._collections[d.name] = self._load(d)
+        if self.path is not None:
+            _open_stores.add(self)
+
+    # ---------- collection ----------
+
+    def collection_exists(self, collection_name):
+        return collection_name in self._collections
+
+    def create_collection(self, collection_name, vectors_config, **kwargs):
+        # quantization_config / on_disk 等 server 端設定不適用：這裡一律是 float32 精確搜尋
+        if not isinstance(vectors_config, models.VectorParams):
+            raise ValueError("NumpyVectorStore 只支援單一未命名向量（VectorParams）")
+        self._collections[collection_name] = _Collection(
+            vectors_config.size, vectors_config.distance
+        )
+        self._dirty.add(collection_name)
+        return True
+
+    def recreate_collection(self, collection_name, vectors_config, **kwargs):
+        self.delete_collection(collection_name)
+        return self.create_collection(collection_name, vectors_config, **kwargs)
+
+    def delete_collection(self, collection_name):
+        existed = self._collections.pop(collection_name, None) is not None
+        self._dirty.add(collection_name)
+        return existed
+
+    def count(self, collection_name, exact=True):
+        return models.CountResult(count=len(self._get(collection_name)))
+
+    def _get(self, collection_name):
+        if collection_name not in self._collections:
+            raise ValueError(f"Collection {collection_name} not found")
+        return self._collections[collection_name]
+
+    # ---------- 寫入 ----------
+
+    def upsert(self, collection_name, points, wait=True):
+        col = self._get(collection_name)
+        points = list(points)
+        if not points:
+            return
+        for p in points:
+            if isinstance(p.vector, dict):
+                raise ValueError("NumpyVectorStore 不支援命名向量")
+
+        vectors = np.asarray([p.vector for p in points], dtype=np.float32)
+        if vectors.shape[1] != col.dim:
+            raise ValueError(f"向量維度 {vectors.shape[1]} 與 collection 的 {col.dim} 不符")
+        col.upsert([p.id for p in points], vectors, [p.payload for p in points])
+        self._dirty.add(collection_name)
+
+    def delete(self, collection_name, points_selector, wait=True):
+        if isinstance(points_selector, models.PointIdsList):
+            ids = points_selector.points
+        else:
+            ids = list(points_selector)
+        self._get(collection_name).delete(ids)
+        self._dirty.add(collection_name)
+
+    # ---------- 讀取 ----------
+
+    def scroll(self, collection_name, limit=10, offset=None, with_payload=True, with_vectors=False):
+        col = self._get(collection_name)
+        start = col.rows[offset] if offset is not None else 0
+        end = min(start + limit, len(col))
+        records = [
+            models.Record(
+                id=col.ids[r],
+                payload=col.payloads[r] if with_payload else None,
+                vector=col.vectors[r].tolist() if with_vectors else None
+            )
+            for r in range(start, end)
+        ]
+        next_offset = col.ids[end] if end < len(col) else None
+        return records, next_offset
+
+    def _points(self, col, rows, scores, with_payload):
+        return [
+            models.ScoredPoint(
+                id=col.ids[r],
+                version=0,
+                score=s,
+                payload=col.payloads[r] if with_payload else None
+            )
+            for r, s in zip(rows.tolist(), scores.tolist())
+        ]
+
+    def query_points(self, collection_name, query, limit=10, with_payload=True, search_params=None, **kwargs):
+        """
+        與 QdrantClient.query_points 相同的呼叫方式；search_params 與 IGNORED_QUERY_ARGS 不影響精確搜尋，
+        其他參數（query_filter / using / score_threshold / offset ...）有給值就直接報錯，不會被默默忽略
+        """
+        unsupported = sorted(
+            k for k, v in kwargs.items() if v is not None and k not in IGNORED_QUERY_ARGS
+        )
+        if unsupported:
+            raise ValueError(f"NumpyVectorStore.query_points 不支援這些參數：{', '.join(unsupported)}")
+        return self.query_batch_points(
+            collection_name,
+            [models.QueryRequest(query=_as_list(query), limit=limit, with_payload=with_payload)]
+        )[0]
+
+    def query_batch_points(self, collection_name, requests):
+        """同一個 limit 的查詢合成一個矩陣，一次 matmul 算完"""
+        col = self._get(collection_name)
+        out = [None] * len(requests)
+
+        groups = {}
+        for i, req in enumerate(requests):
+            if req.prefetch or req.filter or req.using:
+                raise ValueError("NumpyVectorStore 不支援 prefetch / filter / using")
+            if req.offset or req.score_threshold is not None or req.with_vector:
+                raise ValueError("NumpyVectorStore 不支援 offset / score_threshold / with_vector")
+            key = (req.limit, bool(req.with_payload))
+            groups.setdefault(key, []).append(i)
+
+        for (limit, with_payload), idx in groups.items():
+            Q = np.asarray([_as_list(requests[i].query) for i in idx], dtype=np.float32)
+            rows, scores = col.search(Q, limit)
+            for j, i in enumerate(idx):
+                out[i] = models.QueryResponse(
+                    points=self._points(col, rows[j], scores[j], with_payload)
+                )
+        return out
+
+    # ---------- 存檔 / 讀檔 ----------
+
+    def _load(self, d):
+        with open(d / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(d / "points.json", encoding="utf-8") as f:
+            points = json.load(f)
+
+        n = len(points["ids"])
+        vectors = None
+        if n:
+            vectors = np.memmap(d / "vectors.f32", dtype=np.float32, mode="r", shape=(n, meta["dim"]))
+        return _Collection(
+            meta["dim"], models.Distance(meta["distance"]), vectors, points["ids"], points["payloads"]
+        )
+
+    def _save(self, name):
+        d = self.path / name
+        if name not in self._collections:
+            shutil.rmtree(d, ignore_errors=True)
+            return
+
+        col = self._collections[name]
+        tmp = self.path / f".{name}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        if len(col):
+            mm = np.memmap(tmp / "vectors.f32", dtype=np.float32, mode="w+", shape=col.matrix.shape)
+            mm[:] = col.matrix
+            mm.flush()
+            del mm
+        with open(tmp / "points.json", "w", encoding="utf-8") as f:
+            json.dump({"ids": col.ids, "payloads": col.payloads}, f, ensure_ascii=False)
+        with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"dim": col.dim, "distance": col.distance.value}, f)
+
+        shutil.rmtree(d, ignore_errors=True)
+        os.replace(tmp, d)
+        col.vectors = np.memmap(d / "vectors.f32", dtype=np.float32, mode="r",
+                                shape=col.matrix.shape) if len(col) else col.vectors
+
+    def save(self):
+        if self.path is None or not self._dirty:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name in sorted(self._dirty):
+            self._save(name)
+        self._dirty.clear()
+
+    def close(self):
+        self.save()
+
+    def __del__(self):
+        # 被回收時（WeakSet 不會留住物件）把還沒存的變更寫回去
+        if getattr(self, "_dirty", None):
+            self.close()
+
+
+# 所有有 path 的 store 共用一個 atexit：程式結束時存檔，但不會因為註冊過而一直留在記憶體裡
+_open_stores = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all():
+    for store in list(_open_stores):
+        store.close()
+
+
+def _as_list(query):
+    if isinstance(query, np.ndarray):
+        return query.tolist()
+    return query